@@ -0,0 +1,25 @@
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Keyset pagination on the primary key, newest first.
+
+    Each page is an indexed ``WHERE id < <cursor> ORDER BY id DESC LIMIT n``,
+    so page 1000 costs the same as page 1. ``next`` and ``previous`` are
+    URLs with an opaque ``cursor`` parameter. Clients pick the page size
+    with ``?page_size=``, capped at ``max_page_size``.
+    """
+    ordering = '-id'
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+def paginate(request, queryset, serializer_class, pagination_class=KeysetPagination):
+    """
+    Serialize one page of ``queryset`` into a paginated response.
+    """
+    paginator = pagination_class()
+    page = paginator.paginate_queryset(queryset, request)
+    serializer = serializer_class(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
@@ -37,6 +37,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'users',
     'conversations',
     'products',
@@ -48,6 +49,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'conversations.log.RequestIdMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -152,6 +154,8 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',  # Or restrict globally
     ],
+    # Default page size of the keyset-paginated list endpoints.
+    'PAGE_SIZE': int(os.getenv('API_PAGE_SIZE', '50')),
 }
 
 from datetime import timedelta
@@ -185,4 +189,152 @@ SPECTACULAR_SETTINGS = {
 
 AUTH_USER_MODEL = 'users.User'
 
+# Chat agent pipeline: "three_call" (intent, inputs, reply) or "combined"
+# (intent and inputs in one model call, three-call fallback).
+AGENT_PIPELINE_MODE = os.getenv('AGENT_PIPELINE_MODE', 'three_call')
+
+# Intent/input cache in front of the chat agent's first two model calls.
+AGENT_CACHE_ENABLED = os.getenv('AGENT_CACHE_ENABLED', 'true').lower() == 'true'
+AGENT_CACHE_MAX_ENTRIES = int(os.getenv('AGENT_CACHE_MAX_ENTRIES', '10000'))
+AGENT_CACHE_TTL = int(os.getenv('AGENT_CACHE_TTL', '600'))  # seconds
+
+# When false, successful get_order/get_orders/make_order results are rendered
+# from templates instead of a final model call. Requests can send "rich": true.
+AGENT_RICH_REPLIES = os.getenv('AGENT_RICH_REPLIES', 'false').lower() == 'true'
+
+# Function results are projected, truncated to AGENT_RESULT_MAX_ITEMS items
+# and kept under AGENT_RESULT_TOKEN_BUDGET tokens in the final reply prompt.
+AGENT_RESULT_TOKEN_BUDGET = int(os.getenv('AGENT_RESULT_TOKEN_BUDGET', '500'))
+AGENT_RESULT_MAX_ITEMS = int(os.getenv('AGENT_RESULT_MAX_ITEMS', '20'))
+
+# Multi-turn memory: the last AGENT_MEMORY_RECENT_MESSAGES messages go into
+# the prompts verbatim and older ones are folded into a stored summary, one
+# model call per AGENT_MEMORY_FOLD_BATCH messages, oldest first and at most
+# AGENT_MEMORY_MAX_FOLDS calls per turn. Folds run after the reply on
+# AGENT_MEMORY_FOLD_WORKERS background threads. The whole context block stays
+# under AGENT_MEMORY_TOKEN_BUDGET tokens.
+AGENT_MEMORY_ENABLED = os.getenv('AGENT_MEMORY_ENABLED', 'true').lower() == 'true'
+AGENT_MEMORY_RECENT_MESSAGES = int(os.getenv('AGENT_MEMORY_RECENT_MESSAGES', '8'))
+AGENT_MEMORY_TOKEN_BUDGET = int(os.getenv('AGENT_MEMORY_TOKEN_BUDGET', '600'))
+AGENT_MEMORY_SUMMARY_TOKENS = int(os.getenv('AGENT_MEMORY_SUMMARY_TOKENS', '200'))
+AGENT_MEMORY_FOLD_BATCH = int(os.getenv('AGENT_MEMORY_FOLD_BATCH', '8'))
+AGENT_MEMORY_MAX_FOLDS = int(os.getenv('AGENT_MEMORY_MAX_FOLDS', '4'))
+AGENT_MEMORY_FOLD_WORKERS = int(os.getenv('AGENT_MEMORY_FOLD_WORKERS', '2'))
+
+# Chat messages are written through a write-behind buffer ("buffered") or
+# one INSERT at a time ("sync", use this for tests).
+CONVERSATION_WRITE_MODE = os.getenv('CONVERSATION_WRITE_MODE', 'buffered')
+CONVERSATION_FLUSH_INTERVAL = float(os.getenv('CONVERSATION_FLUSH_INTERVAL', '0.2'))  # seconds
+CONVERSATION_FLUSH_BATCH_SIZE = int(os.getenv('CONVERSATION_FLUSH_BATCH_SIZE', '100'))
+
+# Admission control in front of the chat agent (conversations.admission),
+# per process. Each user may start CHAT_USER_RATE_PER_MINUTE turns a minute
+# with bursts of CHAT_USER_BURST; at most CHAT_MAX_CONCURRENT turns run at
+# once. On the async endpoint CHAT_MAX_WAITING more wait up to
+# CHAT_ADMISSION_WAIT_TIMEOUT seconds for a slot; the sync endpoint never
+# waits. The rest get 429 with Retry-After: CHAT_BUSY_RETRY_AFTER.
+# The rate, burst and concurrency must be positive; to turn the limits off
+# set CHAT_ADMISSION_ENABLED=false.
+CHAT_ADMISSION_ENABLED = os.getenv('CHAT_ADMISSION_ENABLED', 'true').lower() == 'true'
+CHAT_USER_RATE_PER_MINUTE = float(os.getenv('CHAT_USER_RATE_PER_MINUTE', '30'))
+CHAT_USER_BURST = int(os.getenv('CHAT_USER_BURST', '10'))
+CHAT_MAX_CONCURRENT = int(os.getenv('CHAT_MAX_CONCURRENT', '32'))
+CHAT_MAX_WAITING = int(os.getenv('CHAT_MAX_WAITING', '64'))
+CHAT_ADMISSION_WAIT_TIMEOUT = float(os.getenv('CHAT_ADMISSION_WAIT_TIMEOUT', '5'))  # seconds
+CHAT_BUSY_RETRY_AFTER = int(os.getenv('CHAT_BUSY_RETRY_AFTER', '2'))  # seconds
+
+# Background chat jobs (conversations.jobs), run by `manage.py run_chat_workers`.
+# A claimed job is leased for CHAT_JOBS_VISIBILITY_TIMEOUT seconds, longer
+# than a whole turn may take; if its worker dies it is claimed again once
+# the lease ends. Failed attempts are retried after CHAT_JOBS_RETRY_DELAY
+# seconds, doubling each time, up to CHAT_JOBS_MAX_ATTEMPTS attempts.
+CHAT_JOBS_CONCURRENCY = int(os.getenv('CHAT_JOBS_CONCURRENCY', '4'))
+CHAT_JOBS_VISIBILITY_TIMEOUT = float(os.getenv('CHAT_JOBS_VISIBILITY_TIMEOUT', '300'))
+CHAT_JOBS_MAX_ATTEMPTS = int(os.getenv('CHAT_JOBS_MAX_ATTEMPTS', '3'))
+CHAT_JOBS_RETRY_DELAY = float(os.getenv('CHAT_JOBS_RETRY_DELAY', '5'))
+CHAT_JOBS_POLL_INTERVAL = float(os.getenv('CHAT_JOBS_POLL_INTERVAL', '0.5'))  # seconds, idle workers and job streams
+CHAT_JOBS_STREAM_TIMEOUT = float(os.getenv('CHAT_JOBS_STREAM_TIMEOUT', '120'))  # seconds a job stream stays open
+
+# LLM client used by the chat agent. BACKEND is a dotted path to an
+# LLMBackend; use 'conversations.llm.StubBackend' to run without network.
+# TIMEOUTS are per pipeline stage, in seconds. HEDGE_STAGES get a second
+# request after HEDGE_DELAY seconds without an answer, at most
+# HEDGE_POOL_SIZE of them in flight per process.
+AGENT_LLM = {
+    'BACKEND': os.getenv('AGENT_LLM_BACKEND', 'conversations.llm.OpenAIBackend'),
+    'OPTIONS': {
+        'model': os.getenv('AGENT_LLM_MODEL', 'mistralai/mistral-7b-instruct'),
+        'api_base': os.getenv('AGENT_LLM_API_BASE', 'https://openrouter.ai/api/v1'),
+        'api_key': os.getenv('OPENROUTER_API_KEY'),
+        'max_connections': int(os.getenv('AGENT_LLM_MAX_CONNECTIONS', '100')),
+        'max_keepalive_connections': int(os.getenv('AGENT_LLM_MAX_KEEPALIVE', '20')),
+    },
+    'TIMEOUTS': {
+        'intent': 10.0,
+        'inputs': 10.0,
+        'combined': 15.0,
+        'final': 30.0,
+        'summary': 20.0,
+        'default': 30.0,
+    },
+    'MAX_RETRIES': int(os.getenv('AGENT_LLM_MAX_RETRIES', '2')),
+    'BACKOFF_BASE': 0.25,
+    'BACKOFF_MAX': 4.0,
+    'HEDGE_STAGES': [s for s in os.getenv('AGENT_LLM_HEDGE_STAGES', '').split(',') if s],
+    'HEDGE_DELAY': float(os.getenv('AGENT_LLM_HEDGE_DELAY', '1.5')),
+    'HEDGE_POOL_SIZE': int(os.getenv('AGENT_LLM_HEDGE_POOL_SIZE', '8')),
+}
+
+# Chat logs are JSON lines written to stderr by a background thread
+# (conversations.log.QueueingHandler), each stamped with the request's
+# X-Request-ID. CHAT_LOG_LEVEL=DEBUG adds per-stage records; of those, the
+# prompts and results themselves are only logged, redacted and clipped to
+# CHAT_LOG_PAYLOAD_CHARS, for a CHAT_LOG_PAYLOAD_SAMPLE_RATE share of requests.
+CHAT_LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv('CHAT_LOG_PAYLOAD_SAMPLE_RATE', '0.01'))
+CHAT_LOG_PAYLOAD_CHARS = int(os.getenv('CHAT_LOG_PAYLOAD_CHARS', '2000'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json': {'()': 'conversations.log.JsonFormatter'},
+    },
+    'filters': {
+        'request_id': {'()': 'conversations.log.RequestIdFilter'},
+    },
+    'handlers': {
+        'json_queue': {
+            '()': 'conversations.log.QueueingHandler',
+            'maxsize': int(os.getenv('CHAT_LOG_QUEUE_SIZE', '10000')),
+            'formatter': 'json',
+            'filters': ['request_id'],
+        },
+    },
+    'loggers': {
+        'conversations': {
+            'handlers': ['json_queue'],
+            'level': os.getenv('CHAT_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+        # Per-turn chat metrics, one JSON line each.
+        'conversations.metrics': {
+            'level': os.getenv('CHAT_METRICS_LOG_LEVEL', 'INFO'),
+        },
+    },
+}
 
+# "catalog" holds the serialized product catalog (products.cache). It is
+# per-process by default. To share it between workers, point
+# PRODUCT_CACHE_BACKEND at e.g. django.core.cache.backends.redis.RedisCache
+# and PRODUCT_CACHE_LOCATION at the server.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalog': {
+        'BACKEND': os.getenv('PRODUCT_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('PRODUCT_CACHE_LOCATION', 'product-catalog'),
+    },
+}
+PRODUCT_CACHE_ALIAS = 'catalog'
+PRODUCT_CACHE_TTL = int(os.getenv('PRODUCT_CACHE_TTL', '300'))  # seconds
@@ -0,0 +1,231 @@
+import csv
+import io
+import json
+import os
+import sys
+import time
+from decimal import Decimal
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional
+from django.core.management.base import BaseCommand, CommandError
+from django.http import StreamingHttpResponse
+from rest_framework import status
+from rest_framework.response import Response
+
+
+CSV = "csv"
+JSONL = "jsonl"
+FORMATS = (CSV, JSONL)
+CONTENT_TYPES = {CSV: "text/csv", JSONL: "application/x-ndjson"}
+
+
+def guess_format(name: str, default: str = CSV) -> str:
+    """
+    Pick the format from a file name's extension (.csv, .jsonl or .ndjson).
+    """
+    extension = os.path.splitext(name or "")[1].lower()
+    if extension == ".csv":
+        return CSV
+    if extension in (".jsonl", ".ndjson"):
+        return JSONL
+    return default
+
+
+def read_rows(stream, fmt: str) -> Iterator[Dict[str, object]]:
+    """
+    Yield one dict per record of a text stream, reading it line by line.
+    Blank JSONL lines are skipped; a malformed one, or one that is not a
+    JSON object, yields an ``_error`` row.
+    """
+    if fmt == CSV:
+        yield from csv.DictReader(stream)
+    elif fmt == JSONL:
+        for line in stream:
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield {"_error": f"Invalid JSON: {e.msg}"}
+                continue
+            yield row if isinstance(row, dict) else {"_error": "Expected a JSON object."}
+    else:
+        raise ValueError(f"Unknown format '{fmt}'")
+
+
+def write_rows(rows: Iterable[tuple], fields: List[str], fmt: str) -> Iterator[str]:
+    """
+    Yield the text of ``rows`` (tuples in ``fields`` order) one record at a
+    time, so a response or file can be written without building it in memory.
+    """
+    if fmt == CSV:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        def line(values):
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerow(values)
+            return buffer.getvalue()
+
+        yield line(fields)
+        for row in rows:
+            yield line(row)
+    elif fmt == JSONL:
+        for row in rows:
+            yield json.dumps(dict(zip(fields, row)), default=_json_default) + "\n"
+    else:
+        raise ValueError(f"Unknown format '{fmt}'")
+
+
+def chunked(iterable: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+class ImportReport:
+    """
+    Counts of an import run, plus the first ``max_errors`` row errors.
+    Rows are numbered from 1 in input order.
+    """
+
+    def __init__(self, max_errors: int = 100):
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.rejected = 0
+        self.errors = []
+        self.max_errors = max_errors
+
+    def reject(self, row_number: int, message: str):
+        self.rejected += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"row": row_number, "error": message})
+
+    @property
+    def rows(self) -> int:
+        return self.created + self.updated + self.unchanged + self.rejected
+
+    def as_dict(self, elapsed: Optional[float] = None) -> dict:
+        data = {
+            "rows": self.rows,
+            "created": self.created,
+            "updated": self.updated,
+            "unchanged": self.unchanged,
+            "rejected": self.rejected,
+        }
+        if elapsed is not None:
+            data["seconds"] = round(elapsed, 3)
+            data["rows_per_second"] = round(self.rows / elapsed, 1) if elapsed else None
+        data["errors"] = sorted(self.errors, key=lambda error: error["row"])
+        return data
+
+
+def export_response(export_rows, request, basename: str) -> StreamingHttpResponse:
+    """
+    Stream ``export_rows(fmt)`` as a download; ``?fmt=`` picks csv or jsonl.
+    """
+    fmt = request.query_params.get("fmt", CSV)
+    if fmt not in FORMATS:
+        return Response({"error": f"fmt must be one of {', '.join(FORMATS)}."}, status=status.HTTP_400_BAD_REQUEST)
+    response = StreamingHttpResponse(export_rows(fmt), content_type=CONTENT_TYPES[fmt])
+    response["Content-Disposition"] = f'attachment; filename="{basename}.{fmt}"'
+    return response
+
+
+def import_response(import_rows, request) -> Response:
+    """
+    Import the multipart ``file`` upload of ``request`` and report the counts.
+    Django spools large uploads to disk, and rows are read one at a time.
+    """
+    upload = request.FILES.get("file")
+    if upload is None:
+        return Response({"error": "Upload the data as a multipart 'file' field."}, status=status.HTTP_400_BAD_REQUEST)
+    fmt = request.query_params.get("fmt") or guess_format(upload.name)
+    if fmt not in FORMATS:
+        return Response({"error": f"fmt must be one of {', '.join(FORMATS)}."}, status=status.HTTP_400_BAD_REQUEST)
+
+    started = time.perf_counter()
+    stream = io.TextIOWrapper(upload.file, encoding="utf-8", newline="")
+    try:
+        report = import_rows(read_rows(stream, fmt))
+    except UnicodeDecodeError:
+        return Response({"error": "The file must be UTF-8 text."}, status=status.HTTP_400_BAD_REQUEST)
+    finally:
+        stream.detach()
+    return Response(report.as_dict(time.perf_counter() - started))
+
+
+class ImportCommand(BaseCommand):
+    """
+    Base for ``import_<model>`` commands. Subclasses set ``import_rows``, a
+    function taking an iterable of row dicts and a batch size and returning
+    an ImportReport.
+    """
+    import_rows = None
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to import, or '-' for stdin.")
+        parser.add_argument("--format", choices=FORMATS, help="Defaults to the file extension, else csv.")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows upserted per transaction.")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"] or guess_format(path)
+        started = time.perf_counter()
+        if path == "-":
+            report = type(self).import_rows(read_rows(sys.stdin, fmt), options["batch_size"])
+        else:
+            try:
+                stream = open(path, newline="", encoding="utf-8")
+            except OSError as e:
+                raise CommandError(str(e))
+            with stream:
+                report = type(self).import_rows(read_rows(stream, fmt), options["batch_size"])
+        elapsed = time.perf_counter() - started
+
+        summary = report.as_dict(elapsed)
+        for error in summary["errors"]:
+            self.stderr.write(f"row {error['row']}: {error['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{summary['rows']} rows in {elapsed:.2f}s ({summary['rows_per_second'] or 0:.0f} rows/s): "
+            f"{report.created} created, {report.updated} updated, {report.unchanged} unchanged, {report.rejected} rejected"
+        ))
+
+
+class ExportCommand(BaseCommand):
+    """
+    Base for ``export_<model>`` commands. Subclasses set ``export_rows``, a
+    function taking a format and returning an iterator of text chunks.
+    """
+    export_rows = None
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", "-o", default="-", help="File to write, or '-' for stdout.")
+        parser.add_argument("--format", choices=FORMATS, help="Defaults to the output extension, else csv.")
+
+    def handle(self, *args, **options):
+        path = options["output"]
+        fmt = options["format"] or guess_format(path)
+        started = time.perf_counter()
+        records = 0
+        stream = sys.stdout if path == "-" else open(path, "w", newline="", encoding="utf-8")
+        try:
+            for chunk in type(self).export_rows(fmt):
+                stream.write(chunk)
+                records += 1
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
+        elapsed = time.perf_counter() - started
+
+        rows = records - 1 if fmt == CSV else records
+        rate = rows / elapsed if elapsed else 0
+        self.stderr.write(self.style.SUCCESS(f"Exported {rows} rows in {elapsed:.2f}s ({rate:.0f} rows/s)."))
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
@@ -1,4 +1,5 @@
 from django.contrib import admin
-from .models import Conversation
+from .models import ChatJob, Conversation
 
 admin.site.register(Conversation)
+admin.site.register(ChatJob)
@@ -0,0 +1,242 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from threading import Condition, Lock
+from typing import Optional
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+
+RATE_LIMITED = "rate_limited"
+OVERLOADED = "overloaded"
+
+
+class AdmissionRejected(Exception):
+    """
+    The turn was refused; the client should retry after ``retry_after`` seconds.
+    """
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Per-key token buckets: ``burst`` tokens, refilled at ``rate`` per second.
+
+    At most ``max_keys`` buckets are kept; the least recently used one is
+    dropped first, which only ever hands that key a full bucket again.
+    """
+
+    def __init__(self, rate: float, burst: int, max_keys: int = 100_000, clock=time.monotonic):
+        if rate <= 0:
+            raise ValueError(f"Token bucket rate must be positive, got {rate}")
+        if burst < 1:
+            raise ValueError(f"Token bucket burst must be at least 1, got {burst}")
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets = OrderedDict()
+        self._lock = Lock()
+
+    def take(self, key) -> float:
+        """
+        Spend one token of ``key``. Returns 0 on success, otherwise the
+        seconds until a token is available (nothing is spent then).
+        """
+        now = self.clock()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / self.rate
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def refund(self, key):
+        """
+        Give back the token of a turn that was refused for another reason.
+        """
+        with self._lock:
+            if key in self._buckets:
+                tokens, updated = self._buckets[key]
+                self._buckets[key] = (min(self.burst, tokens + 1), updated)
+
+
+class ConcurrencyLimiter:
+    """
+    At most ``limit`` holders at once. Up to ``max_waiting`` callers of
+    ``acquire``/``aacquire`` wait for a slot, each for at most
+    ``wait_timeout`` seconds; anyone beyond that is turned away immediately.
+    ``try_acquire`` never waits.
+    """
+
+    def __init__(self, limit: int, max_waiting: int, wait_timeout: float):
+        if limit < 1:
+            raise ValueError(f"Concurrency limit must be at least 1, got {limit}")
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self.active = 0
+        self.waiting = 0
+        self._cond = Condition()
+
+    def acquire(self) -> bool:
+        with self._cond:
+            if self.active < self.limit:
+                self.active += 1
+                return True
+            if self.waiting >= self.max_waiting:
+                return False
+            self.waiting += 1
+            try:
+                deadline = time.monotonic() + self.wait_timeout
+                while self.active >= self.limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+                self.active += 1
+                return True
+            finally:
+                self.waiting -= 1
+
+    def try_acquire(self) -> bool:
+        with self._cond:
+            if self.active < self.limit:
+                self.active += 1
+                return True
+            return False
+
+    async def aacquire(self) -> bool:
+        """
+        Async variant. Waiting happens on an executor thread; the bounded
+        queue caps how many of those there can be.
+        """
+        if self.try_acquire():
+            return True
+        pending = asyncio.ensure_future(sync_to_async(self.acquire, thread_sensitive=False)())
+        try:
+            return await asyncio.shield(pending)
+        except asyncio.CancelledError:
+            # The client went away; give back a slot acquired after that.
+            pending.add_done_callback(lambda done: done.result() and self.release())
+            raise
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+
+class AdmissionController:
+    """
+    Decides whether a chat turn may start, before any model call is made.
+
+    Each user spends one token of their bucket per turn, then the turn
+    needs one of the process-wide concurrency slots. Async turns wait
+    briefly in a bounded queue if they are all taken; sync turns are
+    refused at once, since waiting would hold a WSGI worker thread.
+    Refusals raise AdmissionRejected with a Retry-After hint. Limits are
+    per process: with several workers the effective global limit is the sum.
+    """
+
+    def __init__(self, user_rate: float, user_burst: int, max_concurrent: int, max_waiting: int,
+                 wait_timeout: float, busy_retry_after: int):
+        self.buckets = TokenBucket(user_rate, user_burst)
+        self.limiter = ConcurrencyLimiter(max_concurrent, max_waiting, wait_timeout)
+        self.busy_retry_after = busy_retry_after
+        self.rejected = {RATE_LIMITED: 0, OVERLOADED: 0}
+        self._lock = Lock()
+
+    @classmethod
+    def from_settings(cls) -> Optional["AdmissionController"]:
+        if not settings.CHAT_ADMISSION_ENABLED:
+            return None
+        return cls(
+            user_rate=settings.CHAT_USER_RATE_PER_MINUTE / 60,
+            user_burst=settings.CHAT_USER_BURST,
+            max_concurrent=settings.CHAT_MAX_CONCURRENT,
+            max_waiting=settings.CHAT_MAX_WAITING,
+            wait_timeout=settings.CHAT_ADMISSION_WAIT_TIMEOUT,
+            busy_retry_after=settings.CHAT_BUSY_RETRY_AFTER,
+        )
+
+    def check_rate(self, user_id):
+        """
+        Spend one of the user's tokens, for turns that need no slot (queued jobs).
+        """
+        wait = self.buckets.take(str(user_id))
+        if wait:
+            self._reject(RATE_LIMITED, math.ceil(wait))
+
+    def acquire(self, user_id):
+        """
+        Admit a turn without waiting for a slot; the caller must
+        ``release()`` once it is over.
+        """
+        self.check_rate(user_id)
+        if not self.limiter.try_acquire():
+            self.buckets.refund(str(user_id))
+            self._reject(OVERLOADED, self.busy_retry_after)
+
+    async def aacquire(self, user_id):
+        self.check_rate(user_id)
+        if not await self.limiter.aacquire():
+            self.buckets.refund(str(user_id))
+            self._reject(OVERLOADED, self.busy_retry_after)
+
+    def release(self):
+        self.limiter.release()
+
+    def _reject(self, reason: str, retry_after: int):
+        with self._lock:
+            self.rejected[reason] += 1
+        raise AdmissionRejected(reason, max(1, retry_after))
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            rejected = dict(self.rejected)
+        return {
+            "active": self.limiter.active,
+            "waiting": self.limiter.waiting,
+            "max_concurrent": self.limiter.limit,
+            "max_waiting": self.limiter.max_waiting,
+            "rejected": rejected,
+        }
+
+
+class AdmittedStream:
+    """
+    Event iterator that holds an admission slot for as long as the response
+    streams. Django closes it when the response ends, also when the client
+    left before the first event, which an unstarted generator would miss.
+    """
+
+    def __init__(self, events, controller: AdmissionController):
+        self.events = events
+        self.controller = controller
+        self._released = False
+
+    def __iter__(self):
+        return iter(self.events)
+
+    def close(self):
+        if not self._released:
+            self._released = True
+            self.controller.release()
+        close = getattr(self.events, "close", None)
+        if close is not None:
+            close()
+
+
+admission = AdmissionController.from_settings()
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class ConversationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'conversations'
+
+    def ready(self):
+        # Prompt fragments and the catalog hash are built at startup, not by
+        # the first chat request.
+        from .functions import tools
+        tools.compile()
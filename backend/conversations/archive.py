@@ -0,0 +1,84 @@
+import json
+import zlib
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+from django.db import transaction
+from .models import Conversation, ConversationArchive
+
+
+ARCHIVE_FIELDS = ("id", "direction", "message", "timestamp")
+
+
+def pack(rows: List[dict]) -> bytes:
+    """
+    Compress message rows (``ARCHIVE_FIELDS`` dicts) into a segment payload.
+    """
+    records = [[row["id"], row["direction"], row["message"], row["timestamp"].isoformat()] for row in rows]
+    return zlib.compress(json.dumps(records, separators=(",", ":")).encode(), level=6)
+
+
+def unpack(data: bytes) -> List[dict]:
+    """
+    Inverse of pack(): rows in their original (oldest first) order.
+    """
+    records = json.loads(zlib.decompress(bytes(data)))
+    return [
+        {"id": id_, "direction": direction, "message": message, "timestamp": datetime.fromisoformat(timestamp)}
+        for id_, direction, message, timestamp in records
+    ]
+
+
+def archive_user(user_id, cutoff: datetime, segment_size: int = 500) -> Tuple[int, int]:
+    """
+    Move a user's messages older than ``cutoff`` into compressed segments of
+    up to ``segment_size`` messages, one transaction per segment, so the
+    hot table and its indexes only hold recent history. Returns the number
+    of segments written and of messages moved.
+    """
+    segments = moved = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                Conversation.objects.filter(user_id=user_id, timestamp__lt=cutoff)
+                .order_by("timestamp", "id")
+                .values(*ARCHIVE_FIELDS)[:segment_size]
+            )
+            if not rows:
+                return segments, moved
+            ConversationArchive.objects.create(
+                user_id=user_id,
+                first_id=rows[0]["id"],
+                last_id=rows[-1]["id"],
+                first_timestamp=rows[0]["timestamp"],
+                last_timestamp=rows[-1]["timestamp"],
+                message_count=len(rows),
+                data=pack(rows),
+            )
+            Conversation.objects.filter(id__in=[row["id"] for row in rows]).delete()
+        segments += 1
+        moved += len(rows)
+
+
+def archived_messages(user_id, before: Optional[Tuple[datetime, int]] = None) -> Iterator[dict]:
+    """
+    Yield a user's archived messages newest first, strictly older than the
+    ``before`` (timestamp, id) position. Segments are read and decompressed
+    one at a time, only as far as the caller iterates.
+    """
+    segments = ConversationArchive.objects.filter(user_id=user_id)
+    if before is not None:
+        segments = segments.filter(first_timestamp__lte=before[0])
+    for segment in segments.order_by("-last_timestamp", "-last_id").iterator(chunk_size=4):
+        for row in reversed(unpack(segment.data)):
+            if before is None or (row["timestamp"], row["id"]) < before:
+                yield row
+
+
+def archived_history(user_id) -> List[dict]:
+    """
+    All of a user's archived messages, oldest first.
+    """
+    rows = []
+    for segment in ConversationArchive.objects.filter(user_id=user_id).order_by("first_timestamp", "first_id"):
+        rows.extend(unpack(segment.data))
+    return rows
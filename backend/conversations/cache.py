@@ -0,0 +1,147 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Optional
+from django.conf import settings
+from pydantic import BaseModel
+from .router import normalize_message
+
+
+MISSING = object()
+
+
+class LRUTTLCache:
+    """
+    Thread-safe mapping bounded by size (least recently used goes first)
+    and by age (entries older than ``ttl`` seconds are treated as absent).
+    """
+
+    def __init__(self, maxsize: int, ttl: float, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._data = OrderedDict()
+        self._lock = Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def get(self, key, default=MISSING):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return default
+            value, expires_at = entry
+            if expires_at <= self.clock():
+                del self._data[key]
+                self.stats["expirations"] += 1
+                self.stats["misses"] += 1
+                return default
+            self._data.move_to_end(key)
+            self.stats["hits"] += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, self.clock() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats, size=len(self._data), maxsize=self.maxsize)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+def catalog_hash(
+        function_descriptions: Dict[str, dict],
+        function_inputs: Dict[str, Any],
+        function_schemas: Dict[str, BaseModel],
+) -> str:
+    """
+    Fingerprint of everything the intent and input prompts are built from.
+    """
+    catalog = {
+        "descriptions": function_descriptions,
+        "inputs": function_inputs,
+        "schemas": {name: schema.model_json_schema() for name, schema in function_schemas.items()},
+    }
+    encoded = json.dumps(catalog, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+class AgentCache:
+    """
+    Caches the model's intent and input answers for repeated messages.
+
+    Intents depend only on the message and the catalog, so they are shared
+    between users. Inputs can carry user data and are always keyed by user.
+    Keys include the catalog hash, and a new hash clears both caches.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.intents = LRUTTLCache(maxsize, ttl)
+        self.inputs = LRUTTLCache(maxsize, ttl)
+        self.invalidations = 0
+        self._catalog_hash = None
+        self._lock = Lock()
+
+    @classmethod
+    def from_settings(cls) -> Optional["AgentCache"]:
+        if not settings.AGENT_CACHE_ENABLED:
+            return None
+        return cls(settings.AGENT_CACHE_MAX_ENTRIES, settings.AGENT_CACHE_TTL)
+
+    def bind_hash(self, current: str) -> str:
+        """
+        Return the catalog hash (see ``catalog_hash``), dropping every entry
+        if the catalog changed.
+        """
+        with self._lock:
+            if current != self._catalog_hash:
+                if self._catalog_hash is not None:
+                    self.invalidations += 1
+                self.intents.clear()
+                self.inputs.clear()
+                self._catalog_hash = current
+        return current
+
+    def get_intent(self, catalog: str, message: str) -> Optional[str]:
+        value = self.intents.get((catalog, normalize_message(message)))
+        return None if value is MISSING else value
+
+    def set_intent(self, catalog: str, message: str, function_name: str):
+        self.intents.set((catalog, normalize_message(message)), function_name)
+
+    def get_inputs(self, catalog: str, user_id: str, function_name: str, message: str, context: str = "") -> Optional[dict]:
+        """
+        ``context`` fingerprints the conversation the inputs were read
+        from; "" for inputs taken from the message alone.
+        """
+        value = self.inputs.get((catalog, str(user_id), function_name, normalize_message(message), context))
+        return None if value is MISSING else dict(value)
+
+    def set_inputs(self, catalog: str, user_id: str, function_name: str, message: str, inputs: dict, context: str = ""):
+        self.inputs.set((catalog, str(user_id), function_name, normalize_message(message), context), dict(inputs))
+
+    def snapshot(self) -> dict:
+        return {
+            "intents": self.intents.snapshot(),
+            "inputs": self.inputs.snapshot(),
+            "invalidations": self.invalidations,
+        }
+
+
+agent_cache = AgentCache.from_settings()
@@ -1,18 +1,6 @@
-from langchain.chat_models import ChatOpenAI
-from langchain.agents import initialize_agent, Tool
-from langchain.agents.agent_types import AgentType
-import os
+from .llm import LLMClient
 
 
-llm = ChatOpenAI(
-    model="mistralai/mistral-7b-instruct",
-    openai_api_base="https://openrouter.ai/api/v1",
-    openai_api_key=os.getenv("OPENROUTER_API_KEY"),
-)
-
-# agent = initialize_agent(
-#     llm,
-#     agent=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
-#     verbose=True,
-#     handle_parsing_errors=True  
-# )
\ No newline at end of file
+# Shared by every Agent in the process; backend, timeouts, retries and
+# hedging are configured by settings.AGENT_LLM.
+llm = LLMClient.from_settings()
@@ -0,0 +1,124 @@
+import json
+from typing import Any, Dict, Optional, Tuple
+from django.conf import settings
+from .memory import CHARS_PER_TOKEN
+
+
+ORDER_FIELDS = ["id", "product", "product_name", "quantity", "status"]
+PRODUCT_FIELDS = ["id", "name", "price", "quantity"]
+
+# What the final reply needs from each function's result. A list keeps
+# those keys of a dict (or of every dict in a list); a dict maps keys to
+# the projection of their value, None keeping the value whole.
+RESULT_PROJECTIONS: Dict[str, Any] = {
+    "get_order": ORDER_FIELDS,
+    "get_products": PRODUCT_FIELDS,
+    "search_products": PRODUCT_FIELDS,
+    "make_order": {"success": None, "order": ORDER_FIELDS},
+    "update_profile": ["username", "email"],
+}
+
+# Long lists are sized from this many items when estimating the savings.
+SAMPLE_ITEMS = 20
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN
+
+
+def encode(value: Any) -> str:
+    """
+    Compact JSON: no indentation or spaces, non-ASCII kept as is.
+    """
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def project(value: Any, spec: Any) -> Any:
+    if spec is None:
+        return value
+    if isinstance(value, list):
+        return [project(item, spec) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if isinstance(spec, dict):
+        return {key: project(value[key], sub) for key, sub in spec.items() if key in value}
+    return {key: value[key] for key in spec if key in value}
+
+
+class ResultCompactor:
+    """
+    Shrinks a function result before it is pasted into the final prompt.
+
+    The result is projected to the fields the reply needs, lists (also
+    inside dicts, and multi-line text) are cut to ``max_items`` with an
+    "N more items" note, and the rest is encoded as compact JSON. If that
+    is still over ``token_budget``, items are dropped until it fits, and
+    what still does not fit is clipped. Error results are only
+    re-encoded, never projected or cut.
+    """
+
+    def __init__(self, token_budget: int = 500, max_items: int = 20,
+                 projections: Optional[Dict[str, Any]] = None):
+        self.token_budget = token_budget
+        self.max_items = max_items
+        self.projections = RESULT_PROJECTIONS if projections is None else projections
+
+    @classmethod
+    def from_settings(cls) -> "ResultCompactor":
+        return cls(settings.AGENT_RESULT_TOKEN_BUDGET, settings.AGENT_RESULT_MAX_ITEMS)
+
+    def compact(self, function_name: str, result: Any) -> Tuple[str, dict]:
+        """
+        Return the prompt text for ``result`` and token counts before
+        (the old indented dump, estimated) and after compaction.
+        """
+        original = _indented_size(result) // CHARS_PER_TOKEN
+        if isinstance(result, dict) and "error" in result:
+            text = encode(result)
+        else:
+            spec = self.projections.get(function_name)
+            keep = self.max_items
+            text = self._encode_truncated(result, spec, keep)
+            while estimate_tokens(text) > self.token_budget and keep > 1:
+                keep //= 2
+                text = self._encode_truncated(result, spec, keep)
+            limit = self.token_budget * CHARS_PER_TOKEN
+            if len(text) > limit:
+                text = text[:max(limit - 15, 0)] + "... (truncated)"
+        compacted = estimate_tokens(text)
+        return text, {"original_tokens": original, "tokens": compacted, "saved_tokens": max(original - compacted, 0)}
+
+    def _encode_truncated(self, value: Any, spec: Any, keep: int) -> str:
+        if isinstance(value, str):
+            lines = value.splitlines()
+            if len(lines) > keep:
+                lines = lines[:keep] + [f"... and {len(lines) - keep} more items"]
+            return "\n".join(lines)
+        # Cut first so only the items that are kept get projected.
+        return encode(project(_truncate(value, keep), spec))
+
+
+def _truncate(value: Any, keep: int) -> Any:
+    if isinstance(value, list):
+        items = [_truncate(item, keep) for item in value[:keep]]
+        if len(value) > keep:
+            items.append(f"... and {len(value) - keep} more items")
+        return items
+    if isinstance(value, dict):
+        return {key: _truncate(item, keep) for key, item in value.items()}
+    return value
+
+
+def _indented_size(value: Any) -> int:
+    """
+    About the length of ``json.dumps(value, indent=2)``, without building
+    it for long lists: those are sized from their first items.
+    """
+    if isinstance(value, list) and len(value) > SAMPLE_ITEMS:
+        return _indented_size(value[:SAMPLE_ITEMS]) * len(value) // SAMPLE_ITEMS
+    if isinstance(value, dict) and any(isinstance(item, (list, dict)) for item in value.values()):
+        return sum(len(str(key)) + 8 + _indented_size(item) for key, item in value.items()) + 4
+    return len(json.dumps(value, indent=2, default=str))
+
+
+result_compactor = ResultCompactor.from_settings()
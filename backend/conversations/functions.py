@@ -1,25 +1,57 @@
-
 # from pydantic import BaseModel
+import logging
 from langchain.tools import Tool
-from orders.models import Order
+from orders.models import Order, OrderSummary
 from orders.serializers import OrderSerializer
-from .functions_schemas import GetOrdersInput, UpdateProfileInput, GetOrderInput, GetProductsInput, MakeOrderInput
+from rest_framework.exceptions import ValidationError
+from .functions_schemas import GetOrdersInput, UpdateProfileInput, GetOrderInput, GetProductsInput, MakeOrderInput, SearchProductsInput
+from .router import IntentRouter
+from .tools import ToolRegistry
 from users.serializers import UserSerializer
 from users.models import User
-from products.models import Product
-from products.serializers import ProductSerializer
-
+from decimal import Decimal, InvalidOperation
+from products import search as product_search
+from products.cache import catalog_cache
+from . import log
+
+
+# Every agent function is declared here. "routes" are matched by the
+# IntentRouter against the whole normalized message (lowercase, single
+# spaces, no trailing punctuation); named groups are passed to the function
+# as inputs. Only the description and the schema's field descriptions reach
+# the LLM.
+tools = ToolRegistry()
+logger = logging.getLogger("conversations.functions")
+
+@tools.tool(
+    GetOrdersInput,
+    description="Get all orders for a specific user by providing user_id.",
+    routes=[
+        r"(?:please )?(?:show|list|get|view|see|check)(?: me)?(?: all)? my orders",
+        r"(?:what are |where are )?my orders",
+        r"orders",
+    ],
+)
 def get_orders(user_id:str) -> str:
-    orders = Order.objects.filter(user_id=user_id)
-    if not orders.exists():
+    # One indexed read of the denormalized summaries, no per-order product lookup.
+    summaries = list(OrderSummary.objects.filter(user_id=user_id).order_by("order"))
+    if not summaries:
+        return "You have no orders."
+    return "\n".join(str(summary) for summary in summaries)
+
+
+@tools.async_variant("get_orders")
+async def aget_orders(user_id: str) -> str:
+    lines = [str(summary) async for summary in OrderSummary.objects.filter(user_id=user_id).order_by("order")]
+    if not lines:
         return "You have no orders."
-    return "\n".join(
-        f"Order #{o.id}: {o.product.name} x{o.quantity} ({o.status})" for o in orders
-    )
+    return "\n".join(lines)
 
 
+@tools.tool(UpdateProfileInput, description="Update a user's profile with the provided data.")
 def update_profile(user_id: str, data: dict) -> dict:
-    print(f"[AI TOOL] Called update_profile with user_id={user_id}, data={data}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("update_profile called", extra={"user_id": user_id, **log.payload(data)})
 
     try:
         user = User.objects.get(id=user_id)
@@ -31,23 +63,86 @@ def update_profile(user_id: str, data: dict) -> dict:
         return {"error": "User not found."}
 
 
+@tools.tool(
+    GetOrderInput,
+    description="Get details of a specific order by providing order_id.",
+    routes=[
+        r"(?:please )?(?:(?:show|get|view|check|track)(?: me)? )?(?:my |the )?order(?: number| no\.?| id)? ?#? ?(?P<order_id>\d+)",
+        r"(?:what is the )?status of(?: my)? order ?#? ?(?P<order_id>\d+)",
+        r"where is(?: my)? order ?#? ?(?P<order_id>\d+)",
+    ],
+)
 def get_order(order_id: str) -> dict:
     try:
-        order = Order.objects.get(id=order_id)
-        return OrderSerializer(order).data
+        order = Order.objects.select_related("product").get(id=order_id)
+        return {**OrderSerializer(order).data, "product_name": order.product.name}
     except Order.DoesNotExist:
         return {"error": "Order not found."}
     
 
+@tools.async_variant("get_order")
+async def aget_order(order_id: str) -> dict:
+    try:
+        order = await Order.objects.select_related("product").aget(id=order_id)
+        return {**OrderSerializer(order).data, "product_name": order.product.name}
+    except Order.DoesNotExist:
+        return {"error": "Order not found."}
+
+
+@tools.tool(
+    GetProductsInput,
+    description="Get all products found.",
+    routes=[
+        r"(?:please )?(?:show|list|get|view|see)(?: me)?(?: all)?(?: the)?(?: available)? products",
+        r"what products (?:do you have|are available)",
+        r"products",
+    ],
+)
 def get_products()-> dict:
+    return catalog_cache.get_products()
+
+
+@tools.async_variant("get_products")
+async def aget_products() -> dict:
+    return await catalog_cache.aget_products()
+
+
+@tools.tool(
+    SearchProductsInput,
+    description="Search products by name, optionally within a price range or only in stock. Returns the best matches. Prefer this over get_products whenever the user names a product, a kind of product or a price.",
+    routes=[
+        r"(?:please )?(?:search|find|look)(?: for)?(?: me)?(?: an?| some| the)? (?P<query>(?!.*\border)[a-z0-9][a-z0-9 '-]*)",
+        r"do you (?:have|sell)(?: any| an?)? (?P<query>(?!products?$)[a-z0-9][a-z0-9 '-]*)",
+        r"(?:show me )?(?:products|items)(?: that cost)? (?:under|below|less than|cheaper than) \$?(?P<max_price>\d+(?:\.\d+)?)",
+    ],
+)
+def search_products(query: str = "", min_price: str = None, max_price: str = None, in_stock: str = None) -> dict | list:
     try:
-        products = Product.objects.all()
-        serializer = ProductSerializer(products, many=True)
-        return serializer.data
-    except Product.DoesNotExist:
-        return {"error": "Products not found."}
-    
+        criteria = _search_criteria(query, min_price, max_price, in_stock)
+    except InvalidOperation:
+        return {"error": "Prices must be numbers."}
+    return product_search.search_products(**criteria)
 
+
+@tools.async_variant("search_products")
+async def asearch_products(query: str = "", min_price: str = None, max_price: str = None, in_stock: str = None) -> dict | list:
+    try:
+        criteria = _search_criteria(query, min_price, max_price, in_stock)
+    except InvalidOperation:
+        return {"error": "Prices must be numbers."}
+    return await product_search.asearch_products(**criteria)
+
+
+def _search_criteria(query, min_price, max_price, in_stock) -> dict:
+    return {
+        "query": query or "",
+        "min_price": Decimal(str(min_price).lstrip("$")) if min_price not in (None, "") else None,
+        "max_price": Decimal(str(max_price).lstrip("$")) if max_price not in (None, "") else None,
+        "in_stock": str(in_stock).lower() in ("1", "true", "yes"),
+    }
+
+
+@tools.tool(MakeOrderInput, description="User makes an order to a specific product with a specific quantity")
 def make_order(user_id: str, product_id: str, quantity:str)->dict:
     order_data = {
         "user": user_id,
@@ -59,71 +154,15 @@ def make_order(user_id: str, product_id: str, quantity:str)->dict:
     serializer = OrderSerializer(data=order_data)
 
     if serializer.is_valid():
-        serializer.save()
-        return {"success": "Order created successfully.", "order": serializer.data}
+        try:
+            serializer.save()
+        except ValidationError as e:
+            # Stock ran out between validation and the reservation.
+            return {"error": e.detail}
+        order = {**serializer.data, "product_name": serializer.instance.product.name}
+        return {"success": "Order created successfully.", "order": order}
     else:
         return {"error": serializer.errors}
-    
-
-
-function_descriptions = {
-    "get_orders": {
-        "description": "Get all orders for a specific user by providing user_id.",
-    },
-    "update_profile": {
-        "description": "Update a user's profile with the provided data.",
-    },
-    "get_order": {
-        "description": "Get details of a specific order by providing order_id.",
-    },
-    "get_products":{
-        "description": "Get all products found."
-    },
-    "make_order":{
-        "description": "User makes an order to a specific product with a specific quantity"
-    }
-
-}
-
-
-function_inputs = {
-    "get_orders": {
-        "user_id": "a string representing the user ID, example: '12345'"
-    },
-    "update_profile": {
-        "user_id": "a string representing the user ID, example: '12345'",
-        "data": "a dictionary with profile fields to update"
-    },
-    "get_order": {
-        "order_id": "a string representing the order ID, example: '67890'"
-    },
-    "get_products":None,
-    "make_order":{
-        "user_id": "a string representing the user ID, example: '12345'",
-        "product_id":"a string representing the product ID, example: '12345'",
-        "quantitiy":"a string representing the amount of items the user wants from a specific product"
-    }
-
-}
-
-function_schemas = {
-    "get_orders": GetOrdersInput,
-    "update_profile": UpdateProfileInput,
-    "get_order": GetOrderInput,
-    "get_products":GetProductsInput,
-    "make_order":MakeOrderInput
-}
-
-function_registry = {
-    "get_orders": get_orders,
-    "update_profile": update_profile,
-    "get_order": get_order,
-    "get_products":get_products,
-    "make_order":make_order
-}
-
-
-
-
 
 
+intent_router = IntentRouter(tools.descriptions)
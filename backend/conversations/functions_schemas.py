@@ -1,21 +1,30 @@
 # tools/schemas.py
-from pydantic import BaseModel
-from typing import Dict
+# Field descriptions are what the model is told about each input.
+from pydantic import BaseModel, Field
+from typing import Dict, Optional
+
+USER_ID = "a string representing the user ID, example: '12345'"
 
 class GetOrdersInput(BaseModel):
-    user_id: str
+    user_id: str = Field(description=USER_ID)
 
 class UpdateProfileInput(BaseModel):
-    user_id: str
-    data: Dict[str, str]  # Example: {"name": "John", "email": "john@example.com"}
+    user_id: str = Field(description=USER_ID)
+    data: Dict[str, str] = Field(description="a dictionary with profile fields to update")  # Example: {"name": "John", "email": "john@example.com"}
 
 class GetOrderInput(BaseModel):
-    order_id: str
+    order_id: str = Field(description="a string representing the order ID, example: '67890'")
 
 class GetProductsInput(BaseModel):
     pass
 
 class MakeOrderInput(BaseModel):
-    user_id: str
-    product_id: str
-    quantity: str
+    user_id: str = Field(description=USER_ID)
+    product_id: str = Field(description="a string representing the product ID, example: '12345'")
+    quantity: str = Field(description="a string representing the amount of items the user wants from a specific product")
+
+class SearchProductsInput(BaseModel):
+    query: str = Field("", description="words from the product name the user is looking for, or an empty string")
+    min_price: Optional[str] = Field(None, description="lowest price as a number string, or null")
+    max_price: Optional[str] = Field(None, description="highest price as a number string, or null")
+    in_stock: Optional[str] = Field(None, description="'true' if the user only wants products in stock, else null")
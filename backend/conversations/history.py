@@ -0,0 +1,59 @@
+import base64
+import binascii
+from datetime import datetime
+from typing import List, Optional, Tuple
+from itertools import islice
+from django.db.models import Q
+from .archive import archived_messages
+from .models import Conversation
+
+
+HISTORY_FIELDS = ("id", "direction", "message", "timestamp")
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+def encode_cursor(timestamp: datetime, message_id: int) -> str:
+    raw = f"{timestamp.isoformat()}|{message_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Inverse of encode_cursor(); raises ValueError for anything it did not produce.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp, message_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(timestamp), int(message_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Invalid cursor.")
+
+
+def history_page(user_id, limit: int = DEFAULT_LIMIT, before: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+    """
+    Return up to ``limit`` of a user's messages, newest first, older than the
+    ``before`` cursor, plus the cursor of the next (older) page or None.
+
+    The cursor is the last row's ``(timestamp, id)``, so each page is one
+    range scan of the (user, timestamp, id) index however deep it is, and
+    messages written meanwhile never shift the pages. Rows are plain dicts
+    from ``values()``, not model instances.
+
+    Archived messages are older than every hot one, so a page that runs
+    past the hot table continues into the archive segments, newest first.
+    """
+    position = decode_cursor(before) if before else None
+    messages = Conversation.objects.filter(user_id=user_id)
+    if position:
+        timestamp, message_id = position
+        messages = messages.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=message_id))
+    rows = list(messages.order_by("-timestamp", "-id").values(*HISTORY_FIELDS)[:limit + 1])
+    if len(rows) <= limit:
+        rows.extend(islice(archived_messages(user_id, position), limit + 1 - len(rows)))
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["timestamp"], rows[-1]["id"])
+    return rows, next_cursor
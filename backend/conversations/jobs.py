@@ -0,0 +1,193 @@
+import logging
+import threading
+from datetime import timedelta
+from typing import Optional
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from .cache import agent_cache
+from .functions import intent_router, tools
+from .memory import ConversationMemory
+from .models import ChatJob
+from .persistence import conversation_writer
+from .replies import reply_templates
+from .services import Agent
+from . import log, metrics
+
+
+logger = logging.getLogger("conversations.jobs")
+
+
+def wants_job(request) -> bool:
+    """
+    Job mode is opt-in, via ``?job=true`` or ``Prefer: respond-async``.
+    """
+    if request.GET.get('job', '').lower() in ('1', 'true', 'yes'):
+        return True
+    return 'respond-async' in request.headers.get('Prefer', '')
+
+
+def enqueue(user_id, message: str, rich: Optional[bool] = None) -> ChatJob:
+    """
+    Queue one chat turn. The caller has already saved the user's message.
+    """
+    return ChatJob.objects.create(user_id=user_id, message=message, rich=rich, request_id=log.request_id.get() or "")
+
+
+def claim(visibility_timeout: float, max_attempts: int) -> Optional[ChatJob]:
+    """
+    Lease the oldest available job to the calling worker, or return None.
+
+    Candidates are locked with SKIP LOCKED so concurrent workers pick
+    different rows, and the lease is taken with a conditional UPDATE so two
+    workers can never both own a job, even on databases without row locks.
+    A job whose lease ran out after its last attempt is failed instead.
+    """
+    while True:
+        now = timezone.now()
+        with transaction.atomic():
+            job = (
+                ChatJob.objects.select_for_update(skip_locked=True)
+                .filter(status__in=(ChatJob.QUEUED, ChatJob.RUNNING), available_at__lte=now)
+                .order_by("available_at")
+                .first()
+            )
+            if job is None:
+                return None
+            owned = ChatJob.objects.filter(pk=job.pk, status=job.status, attempts=job.attempts)
+            if job.attempts >= max_attempts:
+                owned.update(status=ChatJob.FAILED, error=job.error or "Worker lease expired.", finished_at=now)
+                metrics.jobs.inc(outcome="failed")
+                continue
+            lease = now + timedelta(seconds=visibility_timeout)
+            if not owned.update(status=ChatJob.RUNNING, attempts=F("attempts") + 1, available_at=lease, started_at=now):
+                continue
+        job.status = ChatJob.RUNNING
+        job.attempts += 1
+        job.available_at = lease
+        job.started_at = now
+        return job
+
+
+def run_job(job: ChatJob, max_attempts: int, retry_delay: float):
+    """
+    Run a claimed job's turn and record the reply, a retry or the failure.
+    Nothing is recorded if the lease was lost to another worker meanwhile.
+    A function an earlier attempt already ran is not run again; its stored
+    result is replied to.
+    """
+    token = log.request_id.set(job.request_id or job.id.hex)
+    try:
+        def record(function_name, inputs, result):
+            ChatJob.objects.filter(pk=job.pk, status=ChatJob.RUNNING, attempts=job.attempts).update(
+                function_name=function_name, function_inputs=inputs, function_result=result,
+            )
+
+        agent = Agent(
+            str(job.user_id), job.message, tools,
+            router=intent_router, cache=agent_cache, reply_templates=reply_templates,
+            rich_reply=job.rich, memory=ConversationMemory.from_settings(str(job.user_id)),
+            on_function_result=record,
+        )
+        try:
+            if job.function_name:
+                reply = agent.replay(job.function_name, job.function_inputs, job.function_result)
+            else:
+                reply = agent.run()
+        except Exception as e:
+            logger.exception("Chat job attempt failed", extra={"job": str(job.id), "attempt": job.attempts})
+            _retry_or_fail(job, e, max_attempts, retry_delay)
+            return
+
+        owned = ChatJob.objects.filter(pk=job.pk, status=ChatJob.RUNNING, attempts=job.attempts)
+        if not owned.update(status=ChatJob.DONE, reply=reply, error="", finished_at=timezone.now()):
+            logger.warning("Chat job lease lost, reply dropped", extra={"job": str(job.id), "attempt": job.attempts})
+            return
+        with agent.timed("persist"):
+            conversation_writer.save(str(job.user_id), reply, "llm")
+        metrics.jobs.inc(outcome="done")
+        metrics.record_turn(agent)
+    finally:
+        log.request_id.reset(token)
+
+
+def _retry_or_fail(job: ChatJob, error: Exception, max_attempts: int, retry_delay: float):
+    owned = ChatJob.objects.filter(pk=job.pk, status=ChatJob.RUNNING, attempts=job.attempts)
+    now = timezone.now()
+    if job.attempts < max_attempts:
+        delay = retry_delay * 2 ** (job.attempts - 1)
+        owned.update(status=ChatJob.QUEUED, available_at=now + timedelta(seconds=delay), error=str(error))
+        metrics.jobs.inc(outcome="retried")
+    else:
+        owned.update(status=ChatJob.FAILED, error=str(error), finished_at=now)
+        metrics.jobs.inc(outcome="failed")
+
+
+class ChatWorkerPool:
+    """
+    ``concurrency`` threads, each claiming and running one job at a time.
+    Idle workers poll every ``poll_interval`` seconds. With ``drain`` a
+    worker exits as soon as it finds the queue empty.
+    """
+
+    def __init__(self, concurrency: int, visibility_timeout: float, max_attempts: int,
+                 retry_delay: float, poll_interval: float):
+        self.concurrency = concurrency
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.poll_interval = poll_interval
+        self.processed = 0
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    @classmethod
+    def from_settings(cls, **overrides) -> "ChatWorkerPool":
+        options = {
+            "concurrency": settings.CHAT_JOBS_CONCURRENCY,
+            "visibility_timeout": settings.CHAT_JOBS_VISIBILITY_TIMEOUT,
+            "max_attempts": settings.CHAT_JOBS_MAX_ATTEMPTS,
+            "retry_delay": settings.CHAT_JOBS_RETRY_DELAY,
+            "poll_interval": settings.CHAT_JOBS_POLL_INTERVAL,
+        }
+        options.update({key: value for key, value in overrides.items() if value is not None})
+        return cls(**options)
+
+    def start(self, drain: bool = False):
+        self._threads = [
+            threading.Thread(target=self._work, args=(drain,), name=f"chat-worker-{i}", daemon=True)
+            for i in range(self.concurrency)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def is_alive(self) -> bool:
+        return any(thread.is_alive() for thread in self._threads)
+
+    def join(self, timeout: Optional[float] = None):
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _work(self, drain: bool):
+        while not self._stop.is_set():
+            close_old_connections()
+            try:
+                job = claim(self.visibility_timeout, self.max_attempts)
+                if job is None:
+                    if drain:
+                        return
+                    self._stop.wait(self.poll_interval)
+                    continue
+                run_job(job, self.max_attempts, self.retry_delay)
+                with self._lock:
+                    self.processed += 1
+            except Exception:
+                logger.exception("Chat worker error")
+                self._stop.wait(self.poll_interval)
+            finally:
+                close_old_connections()
@@ -0,0 +1,410 @@
+import asyncio
+import concurrent.futures
+import json
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, Optional
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class LLMResponse:
+    """
+    Backend-neutral model answer; ``content`` matches the LangChain message API.
+    """
+    def __init__(self, content: str, usage: Optional[dict] = None):
+        self.content = content
+        self.usage = usage or {}
+
+    def __repr__(self):
+        return f"LLMResponse({self.content!r})"
+
+
+class LLMBackend:
+    """
+    Transport for LLMClient. Backends make exactly one attempt per call;
+    timeouts, retries and hedging are the client's job.
+    """
+    # Exceptions worth another attempt (timeouts, dropped connections, 429/5xx).
+    retryable_errors = (TimeoutError, ConnectionError)
+
+    def invoke(self, prompt: str, stage: str, timeout: float) -> LLMResponse:
+        raise NotImplementedError
+
+    async def ainvoke(self, prompt: str, stage: str, timeout: float) -> LLMResponse:
+        raise NotImplementedError
+
+    def stream(self, prompt: str, stage: str, timeout: float) -> Iterator[LLMResponse]:
+        yield self.invoke(prompt, stage, timeout)
+
+
+class OpenAIBackend(LLMBackend):
+    """
+    OpenAI-compatible chat completions API (OpenRouter by default) over
+    pooled keep-alive HTTP connections shared by every request in the process.
+    """
+
+    def __init__(self, model: str, api_base: str, api_key: Optional[str] = None,
+                 max_connections: int = 100, max_keepalive_connections: int = 20, keepalive_expiry: float = 30.0):
+        import httpx
+        import openai
+
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        # max_retries=0: LLMClient owns the retry policy.
+        self.client = openai.OpenAI(base_url=api_base, api_key=api_key, max_retries=0,
+                                    http_client=httpx.Client(limits=limits))
+        self.async_client = openai.AsyncOpenAI(base_url=api_base, api_key=api_key, max_retries=0,
+                                               http_client=httpx.AsyncClient(limits=limits))
+        self.model = model
+        self.retryable_errors = (
+            openai.APITimeoutError, openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError,
+        )
+
+    def _messages(self, prompt: str):
+        return [{"role": "user", "content": prompt}]
+
+    def _usage(self, completion) -> dict:
+        usage = getattr(completion, "usage", None)
+        if usage is None:
+            return {}
+        return {"prompt_tokens": usage.prompt_tokens, "completion_tokens": usage.completion_tokens}
+
+    def invoke(self, prompt, stage, timeout):
+        completion = self.client.chat.completions.create(
+            model=self.model, messages=self._messages(prompt), timeout=timeout,
+        )
+        return LLMResponse(completion.choices[0].message.content or "", self._usage(completion))
+
+    async def ainvoke(self, prompt, stage, timeout):
+        completion = await self.async_client.chat.completions.create(
+            model=self.model, messages=self._messages(prompt), timeout=timeout,
+        )
+        return LLMResponse(completion.choices[0].message.content or "", self._usage(completion))
+
+    def stream(self, prompt, stage, timeout):
+        chunks = self.client.chat.completions.create(
+            model=self.model, messages=self._messages(prompt), timeout=timeout, stream=True,
+        )
+        for chunk in chunks:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield LLMResponse(chunk.choices[0].delta.content)
+
+
+class StubBackend(LLMBackend):
+    """
+    Offline backend with canned answers per stage, for development and CI.
+
+    The defaults route every message to ``get_products``; pass ``responses``
+    to override the answer of any stage. Connection options meant for
+    OpenAIBackend are accepted and ignored, so only BACKEND has to change.
+    """
+    default_responses = {
+        "intent": '{"function": "get_products"}',
+        "inputs": "{}",
+        "combined": '{"function": "get_products", "inputs": {}}',
+        "final": "This is a stub reply.",
+        "summary": "The user has been browsing products.",
+    }
+
+    def __init__(self, responses: Optional[Dict[str, str]] = None, **options):
+        self.responses = {**self.default_responses, **(responses or {})}
+
+    def _answer(self, stage: str) -> LLMResponse:
+        return LLMResponse(self.responses.get(stage, ""))
+
+    def invoke(self, prompt, stage, timeout):
+        return self._answer(stage)
+
+    async def ainvoke(self, prompt, stage, timeout):
+        return self._answer(stage)
+
+    def stream(self, prompt, stage, timeout):
+        for word in self._answer(stage).content.split(" "):
+            yield LLMResponse(word + " ")
+
+
+class FakeBackend(LLMBackend):
+    """
+    Deterministic scripted model with simulated latency, for benchmarks.
+
+    ``script`` is a list of rules (or a path to a JSON file holding one),
+    tried in order against the user's message::
+
+        {"match": "order #?(?P<order_id>\\d+)", "function": "get_order",
+         "inputs": {"order_id": "{order_id}"}, "reply": "Here is your order."}
+
+    Named groups, plus ``user_id`` from the prompt, are substituted into the
+    inputs. The final reply is taken from the first rule for the function
+    the prompt names. ``latency`` is seconds per call, either one number or
+    a dict keyed by stage, and ``jitter`` adds up to that fraction on top
+    from a seeded generator, so runs are repeatable.
+    """
+    _message_patterns = (
+        re.compile(r'^User input: (?P<message>.*)$', re.MULTILINE),
+        re.compile(r'said: "(?P<message>.*)"'),
+        re.compile(r'^User said: "(?P<message>.*)"$', re.MULTILINE),
+    )
+    _user_pattern = re.compile(r"The user_id (?P<user_id>\S+) said")
+    _function_pattern = re.compile(r"^Function to call: (?P<function>\w+)$", re.MULTILINE)
+
+    default_script = [
+        {"match": r".*\border\s*#?\s*(?P<order_id>\d+).*", "function": "get_order",
+         "inputs": {"order_id": "{order_id}"}, "reply": "Here are the details of your order."},
+        {"match": r".*\b(?:my )?orders\b.*", "function": "get_orders",
+         "inputs": {"user_id": "{user_id}"}, "reply": "Here are your orders."},
+        {"match": r".*", "function": "get_products", "inputs": {}, "reply": "Here is what we sell."},
+    ]
+
+    def __init__(self, script=None, latency=0.0, jitter=0.0, seed: int = 0, **options):
+        if isinstance(script, str):
+            with open(script) as f:
+                script = json.load(f)
+        self.rules = [
+            {**rule, "match": re.compile(rule.get("match", ".*"), re.IGNORECASE | re.DOTALL)}
+            for rule in (script or self.default_script)
+        ]
+        self.latency = latency
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _delay(self, stage: str) -> float:
+        base = self.latency.get(stage, self.latency.get("default", 0.0)) if isinstance(self.latency, dict) else self.latency
+        if not self.jitter:
+            return base
+        with self._lock:
+            return base * (1 + self._random.uniform(0, self.jitter))
+
+    def _answer(self, prompt: str, stage: str) -> LLMResponse:
+        if stage == "final":
+            return self._usage(prompt, self._reply(prompt))
+        if stage == "summary":
+            return self._usage(prompt, "Earlier, the user asked about their orders and our products.")
+
+        message = ""
+        for pattern in self._message_patterns:
+            found = pattern.search(prompt)
+            if found:
+                message = found.group("message")
+                break
+        user = self._user_pattern.search(prompt)
+        values = {"user_id": user.group("user_id") if user else ""}
+
+        for rule in self.rules:
+            match = rule["match"].fullmatch(message.strip())
+            if match:
+                values.update({k: v for k, v in match.groupdict().items() if v is not None})
+                break
+        else:
+            return LLMResponse('{"function": null}' if stage == "intent" else "")
+
+        inputs = {k: str(v).format(**values) for k, v in rule.get("inputs", {}).items()}
+        if stage == "intent":
+            content = json.dumps({"function": rule["function"]})
+        elif stage == "inputs":
+            content = json.dumps(inputs)
+        elif stage == "combined":
+            content = json.dumps({"function": rule["function"], "inputs": inputs})
+        else:
+            content = ""
+        return self._usage(prompt, content)
+
+    def _reply(self, prompt: str) -> str:
+        found = self._function_pattern.search(prompt)
+        function_name = found.group("function") if found else None
+        for rule in self.rules:
+            if rule.get("function") == function_name:
+                return rule.get("reply", "OK.").format_map(defaultdict(str))
+        return "Sorry, I could not help with that. Could you rephrase?"
+
+    def _usage(self, prompt: str, content: str) -> LLMResponse:
+        # Rough token counts so usage-based metrics have something to show.
+        return LLMResponse(content, {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4})
+
+    def invoke(self, prompt, stage, timeout):
+        time.sleep(self._delay(stage))
+        return self._answer(prompt, stage)
+
+    async def ainvoke(self, prompt, stage, timeout):
+        await asyncio.sleep(self._delay(stage))
+        return self._answer(prompt, stage)
+
+    def stream(self, prompt, stage, timeout):
+        response = self.invoke(prompt, stage, timeout)
+        for word in response.content.split(" "):
+            yield LLMResponse(word + " ")
+
+
+class LLMClient:
+    """
+    The agent's single entry point to the model.
+
+    Every call names its pipeline stage ("intent", "inputs", "combined",
+    "final", ...), which selects the timeout. Retryable failures are retried
+    up to ``max_retries`` times with full-jitter exponential backoff. Stages
+    listed in ``hedge_stages`` send a second identical request when the first
+    has not answered after ``hedge_delay`` seconds. Sync calls keep the first
+    request on the caller's thread and fall back to the hedge's answer when
+    it fails; at most ``hedge_pool_size`` hedges are in flight, and none is
+    sent while they are all taken. Async calls use whichever answers first.
+
+    The backend is built on first use when given as ``backend_factory``,
+    so importing the app needs no credentials.
+    """
+
+    def __init__(self, backend: Optional[LLMBackend] = None, timeouts: Optional[Dict[str, float]] = None, max_retries: int = 2,
+                 backoff_base: float = 0.25, backoff_max: float = 4.0,
+                 hedge_stages: Iterable[str] = (), hedge_delay: float = 1.0, hedge_pool_size: int = 8,
+                 backend_factory: Optional[Callable[[], LLMBackend]] = None):
+        self._backend = backend
+        self._backend_factory = backend_factory
+        self._backend_lock = threading.Lock()
+        self.timeouts = {"default": 30.0, **(timeouts or {})}
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_stages = set(hedge_stages)
+        self.hedge_delay = hedge_delay
+        self.hedge_pool_size = hedge_pool_size
+        self._hedge_pool = None
+        self._hedge_pool_lock = threading.Lock()
+        self._hedge_slots = threading.BoundedSemaphore(hedge_pool_size)
+
+    @classmethod
+    def from_settings(cls) -> "LLMClient":
+        config = settings.AGENT_LLM
+        return cls(
+            backend_factory=lambda: import_string(config["BACKEND"])(**config.get("OPTIONS", {})),
+            timeouts=config.get("TIMEOUTS"),
+            max_retries=config.get("MAX_RETRIES", 2),
+            backoff_base=config.get("BACKOFF_BASE", 0.25),
+            backoff_max=config.get("BACKOFF_MAX", 4.0),
+            hedge_stages=config.get("HEDGE_STAGES", ()),
+            hedge_delay=config.get("HEDGE_DELAY", 1.0),
+            hedge_pool_size=config.get("HEDGE_POOL_SIZE", 8),
+        )
+
+    @property
+    def backend(self) -> LLMBackend:
+        if self._backend is None:
+            with self._backend_lock:
+                if self._backend is None:
+                    self._backend = self._backend_factory()
+        return self._backend
+
+    @contextmanager
+    def override_backend(self, backend: LLMBackend):
+        """
+        Use ``backend`` inside the block, without building the configured one.
+        """
+        previous, self._backend = self._backend, backend
+        try:
+            yield backend
+        finally:
+            self._backend = previous
+
+    def timeout_for(self, stage: str) -> float:
+        return self.timeouts.get(stage, self.timeouts["default"])
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def invoke(self, prompt: str, stage: str = "default") -> LLMResponse:
+        call = self._hedged if stage in self.hedge_stages else self.backend.invoke
+        for attempt in range(self.max_retries + 1):
+            try:
+                return call(prompt, stage, self.timeout_for(stage))
+            except self.backend.retryable_errors:
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self._backoff(attempt))
+
+    async def ainvoke(self, prompt: str, stage: str = "default") -> LLMResponse:
+        call = self._ahedged if stage in self.hedge_stages else self.backend.ainvoke
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await call(prompt, stage, self.timeout_for(stage))
+            except self.backend.retryable_errors:
+                if attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(self._backoff(attempt))
+
+    def stream(self, prompt: str, stage: str = "final") -> Iterator[LLMResponse]:
+        """
+        Stream chunks; a failed attempt is retried only before its first chunk.
+        """
+        for attempt in range(self.max_retries + 1):
+            started = False
+            try:
+                for chunk in self.backend.stream(prompt, stage, self.timeout_for(stage)):
+                    started = True
+                    yield chunk
+                return
+            except self.backend.retryable_errors:
+                if started or attempt == self.max_retries:
+                    raise
+                time.sleep(self._backoff(attempt))
+
+    def _hedged(self, prompt: str, stage: str, timeout: float) -> LLMResponse:
+        answered = threading.Event()
+        hedge = None
+        if self._hedge_slots.acquire(blocking=False):
+            try:
+                hedge = self._pool().submit(self._hedge, answered, prompt, stage, timeout)
+            except RuntimeError:
+                # The pool is shut down (interpreter exit).
+                self._hedge_slots.release()
+        try:
+            response = self.backend.invoke(prompt, stage, timeout)
+        except self.backend.retryable_errors:
+            # A hedge that never started returns None.
+            if hedge is None or hedge.exception() is not None or hedge.result() is None:
+                raise
+            return hedge.result()
+        answered.set()
+        return response
+
+    def _hedge(self, answered: threading.Event, prompt: str, stage: str, timeout: float) -> Optional[LLMResponse]:
+        try:
+            if answered.wait(self.hedge_delay):
+                return None
+            return self.backend.invoke(prompt, stage, timeout)
+        finally:
+            self._hedge_slots.release()
+
+    def _pool(self) -> concurrent.futures.ThreadPoolExecutor:
+        with self._hedge_pool_lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.hedge_pool_size, thread_name_prefix="llm-hedge",
+                )
+            return self._hedge_pool
+
+    async def _ahedged(self, prompt: str, stage: str, timeout: float) -> LLMResponse:
+        pending = {asyncio.ensure_future(self.backend.ainvoke(prompt, stage, timeout))}
+        done, pending = await asyncio.wait(pending, timeout=self.hedge_delay)
+        if not done:
+            pending.add(asyncio.ensure_future(self.backend.ainvoke(prompt, stage, timeout)))
+
+        error = None
+        try:
+            while pending or done:
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+                if not pending:
+                    break
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
@@ -0,0 +1,224 @@
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import re
+import uuid
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+
+# Attributes every LogRecord has; anything else was passed via ``extra``.
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+REQUEST_ID_HEADER = "X-Request-ID"
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+# Set per request by RequestIdMiddleware; asgiref copies both into
+# sync_to_async threads, so they follow the request through the agent.
+request_id = ContextVar("chat_request_id", default=None)
+payload_sampled = ContextVar("chat_payload_sampled", default=False)
+
+SENSITIVE_KEYS = {"password", "token", "access", "refresh", "secret", "authorization", "api_key", "email"}
+REDACTED = "[redacted]"
+_SENSITIVE_TEXT = [
+    (re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+"), "[email]"),
+    (re.compile(r"(?i)bearer\s+[\w.~+/=-]+"), "Bearer [redacted]"),
+    (re.compile(r"\beyJ[\w-]+\.[\w-]+\.[\w-]+"), "[jwt]"),
+    (re.compile(r"\b(?:\d[ -]?){12,18}\d\b"), "[number]"),
+]
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line: timestamp, level, logger, message and every
+    field passed through ``extra``.
+    """
+
+    def format(self, record):
+        payload = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        payload.update({key: value for key, value in vars(record).items() if key not in _RESERVED})
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+class RequestIdFilter(logging.Filter):
+    """
+    Stamp records with the current request's correlation id. Runs on the
+    logging thread, before the record is queued.
+    """
+
+    def filter(self, record):
+        current = request_id.get()
+        if current is not None:
+            record.request_id = current
+        return True
+
+
+class QueueingHandler(QueueHandler):
+    """
+    Hands records to a bounded queue that a listener thread formats and
+    writes to ``stream`` (stderr by default), so request threads never wait
+    on stdout. When the queue is full the record is dropped and counted
+    rather than blocking the request.
+
+    Fields passed through ``extra`` are formatted later, on the listener
+    thread: do not mutate them after logging.
+    """
+
+    def __init__(self, stream=None, maxsize: int = 10000):
+        super().__init__(queue.Queue(maxsize))
+        self.target = logging.StreamHandler(stream)
+        self.dropped = 0
+        self._listener = None
+        self._pid = None
+        atexit.register(self.close)
+
+    def setFormatter(self, fmt):
+        super().setFormatter(fmt)
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # Only freeze the message; JSON formatting happens on the listener.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        # Started lazily so a worker forked after logging setup gets its own thread.
+        if self._pid != os.getpid():
+            self._listener = QueueListener(self.queue, self.target)
+            self._listener.start()
+            self._pid = os.getpid()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        if self._listener is not None and self._pid == os.getpid():
+            self._listener.stop()
+            self._listener = None
+        self.target.flush()
+        super().close()
+
+
+class RequestIdMiddleware:
+    """
+    Give every request a correlation id: the client's ``X-Request-ID`` when
+    it looks sane, a fresh one otherwise. The id is echoed in the response
+    header and stamped on every log record written while handling the
+    request, streamed responses included. Also decides once per request
+    whether its prompts and results may be logged (see ``payload``).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        tokens = self._start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            self._reset(tokens)
+        return self._finish(request, response)
+
+    async def __acall__(self, request):
+        tokens = self._start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            self._reset(tokens)
+        return self._finish(request, response)
+
+    def _start(self, request):
+        incoming = request.headers.get(REQUEST_ID_HEADER, "")
+        request.request_id = incoming if _VALID_REQUEST_ID.match(incoming) else uuid.uuid4().hex
+        request.payload_sampled = random.random() < settings.CHAT_LOG_PAYLOAD_SAMPLE_RATE
+        return request_id.set(request.request_id), payload_sampled.set(request.payload_sampled)
+
+    def _reset(self, tokens):
+        request_id.reset(tokens[0])
+        payload_sampled.reset(tokens[1])
+
+    def _finish(self, request, response):
+        response[REQUEST_ID_HEADER] = request.request_id
+        if getattr(response, "streaming", False):
+            # Streamed bodies are produced after this middleware returned.
+            if response.is_async:
+                response.streaming_content = _abind(response.streaming_content, request)
+            else:
+                response.streaming_content = _bind(response.streaming_content, request)
+        return response
+
+
+def _bind(chunks, request):
+    tokens = request_id.set(request.request_id), payload_sampled.set(request.payload_sampled)
+    try:
+        yield from chunks
+    finally:
+        request_id.reset(tokens[0])
+        payload_sampled.reset(tokens[1])
+
+
+async def _abind(chunks, request):
+    tokens = request_id.set(request.request_id), payload_sampled.set(request.payload_sampled)
+    try:
+        async for chunk in chunks:
+            yield chunk
+    finally:
+        request_id.reset(tokens[0])
+        payload_sampled.reset(tokens[1])
+
+
+def redact(value):
+    """
+    Copy of ``value`` with sensitive keys masked and emails, bearer tokens,
+    JWTs and card-like numbers replaced in strings.
+    """
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if str(key).lower() in SENSITIVE_KEYS else redact(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    if isinstance(value, str):
+        for pattern, replacement in _SENSITIVE_TEXT:
+            value = pattern.sub(replacement, value)
+    return value
+
+
+def payload(value) -> dict:
+    """
+    ``extra`` fields for a prompt, model answer or function result: the
+    value clipped to CHAT_LOG_PAYLOAD_CHARS and redacted if this request
+    was sampled, nothing otherwise. Call it behind an ``isEnabledFor``
+    check; it serializes the value.
+    """
+    if not payload_sampled.get():
+        return {}
+    text = value if isinstance(value, str) else json.dumps(redact(value), default=str, separators=(",", ":"))
+    limit = settings.CHAT_LOG_PAYLOAD_CHARS
+    if len(text) > limit:
+        text = f"{text[:limit]}...(+{len(text) - limit} chars)"
+    return {"payload": redact(text)}
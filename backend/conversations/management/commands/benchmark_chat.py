@@ -0,0 +1,173 @@
+import itertools
+import queue
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import nullcontext
+from decimal import Decimal
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from conversations import views
+from conversations.chat_agent import llm
+from conversations.llm import FakeBackend
+from conversations.management.benchmarking import summarize
+from conversations.persistence import conversation_writer
+from conversations.signals import agent_finished
+from orders.models import Order
+from orders.summaries import save_summaries
+from products.models import Product
+from users.models import User
+
+
+DEFAULT_MESSAGES = [
+    "show my orders",
+    "list products",
+    "order #{order_id}",
+    "what do you sell?",
+    "can you tell me what I ordered recently",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed benchmark users, products and orders, drive the chat endpoint at a fixed concurrency "
+        "and report p50/p95/p99 latency per agent stage plus requests/sec. Uses the scripted "
+        "FakeBackend unless --configured-llm is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200, help="Total chat requests to send.")
+        parser.add_argument("--concurrency", type=int, default=10, help="Requests in flight at once.")
+        parser.add_argument("--users", type=int, default=20, help="Benchmark users to seed and rotate through.")
+        parser.add_argument("--products", type=int, default=50, help="Products to seed.")
+        parser.add_argument("--orders-per-user", type=int, default=5, help="Orders to seed per user.")
+        parser.add_argument("--endpoint", default="/api/conversations/chat/", help="Chat URL to drive, e.g. /api/conversations/chat/async/.")
+        parser.add_argument("--message", action="append", dest="messages",
+                            help="Message to send; repeat for a mix. '{order_id}' is replaced with one of the user's orders.")
+        parser.add_argument("--latency", type=float, default=0.05, help="Fake model latency per call, in seconds.")
+        parser.add_argument("--jitter", type=float, default=0.2, help="Extra fake latency, as a fraction of --latency.")
+        parser.add_argument("--script", help="JSON file with FakeBackend rules.")
+        parser.add_argument("--seed", type=int, default=0, help="Seed for the fake model's jitter.")
+        parser.add_argument("--configured-llm", action="store_true", help="Use the backend from settings instead of the fake one.")
+        parser.add_argument("--admission", action="store_true",
+                            help="Keep admission control on; by default it is off so the run measures chat turns, not 429s.")
+
+    def handle(self, *args, **options):
+        users = self._seed(options["users"], options["products"], options["orders_per_user"])
+        tokens = {user.id: str(RefreshToken.for_user(user).access_token) for user in users}
+        order_ids = defaultdict(list)
+        for order in Order.objects.filter(user__in=users).values("id", "user_id"):
+            order_ids[order["user_id"]].append(order["id"])
+
+        messages = options["messages"] or DEFAULT_MESSAGES
+        jobs = queue.Queue()
+        pairs = zip(itertools.cycle(users), itertools.cycle(messages))
+        for i, (user, message) in zip(range(options["requests"]), pairs):
+            ids = order_ids[user.id] or [0]
+            jobs.put((user, message.format(order_id=ids[i % len(ids)])))
+
+        stages = defaultdict(list)
+        errors = []
+        lock = threading.Lock()
+
+        def on_agent_finished(sender, agent, **kwargs):
+            with lock:
+                for stage, elapsed in agent.timings.items():
+                    stages[stage].append(elapsed)
+
+        def worker():
+            # Server errors come back as 500s to count, not exceptions that end the worker.
+            client = APIClient(raise_request_exception=False)
+            try:
+                while True:
+                    try:
+                        user, message = jobs.get_nowait()
+                    except queue.Empty:
+                        return
+                    start = time.perf_counter()
+                    response = client.post(
+                        options["endpoint"], {"message": message}, format="json",
+                        HTTP_AUTHORIZATION=f"Bearer {tokens[user.id]}",
+                    )
+                    if getattr(response, "streaming", False):
+                        b"".join(response.streaming_content)
+                    elapsed = (time.perf_counter() - start) * 1000
+                    with lock:
+                        stages["total"].append(elapsed)
+                        if response.status_code != 200:
+                            errors.append(response.status_code)
+            finally:
+                connection.close()
+
+        original_admission = views.admission
+        model = nullcontext() if options["configured_llm"] else llm.override_backend(
+            FakeBackend(script=options["script"], latency=options["latency"], jitter=options["jitter"], seed=options["seed"])
+        )
+        if not options["admission"]:
+            views.admission = None
+        agent_finished.connect(on_agent_finished, dispatch_uid="benchmark_chat")
+        # The test client sends Host: testserver.
+        hosts = override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"])
+        hosts.enable()
+        try:
+            with model:
+                started = time.perf_counter()
+                threads = [threading.Thread(target=worker) for _ in range(options["concurrency"])]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                wall = time.perf_counter() - started
+                conversation_writer.flush()
+        finally:
+            hosts.disable()
+            agent_finished.disconnect(dispatch_uid="benchmark_chat")
+            views.admission = original_admission
+
+        self._report(stages, errors, wall, options)
+        if errors:
+            statuses = ", ".join(f"{status}: {count}" for status, count in sorted(Counter(errors).items()))
+            raise CommandError(f"{len(errors)} of {len(stages['total'])} requests failed ({statuses}).")
+
+    def _seed(self, user_count, product_count, orders_per_user):
+        users = []
+        for i in range(user_count):
+            user = User.objects.filter(email=f"bench{i}@bench.local").first()
+            if user is None:
+                user = User.objects.create_user(f"bench{i}@bench.local", f"bench{i}", password="bench-password")
+            users.append(user)
+
+        existing = Product.objects.filter(name__startswith="Bench product ").count()
+        Product.objects.bulk_create([
+            Product(name=f"Bench product {i}", price=Decimal("9.99") + i, quantity=1_000_000)
+            for i in range(existing, product_count)
+        ])
+        products = list(Product.objects.filter(name__startswith="Bench product ")[:product_count])
+
+        new_orders = []
+        for user in users:
+            have = Order.objects.filter(user=user).count()
+            for i in range(have, orders_per_user):
+                new_orders.append(Order(user=user, product=products[(user.id + i) % len(products)], quantity=1 + i % 3))
+        # bulk_create skips the signals that maintain the order summaries.
+        save_summaries(Order.objects.bulk_create(new_orders))
+        return users
+
+    def _report(self, stages, errors, wall, options):
+        total = len(stages["total"])
+        self.stdout.write(
+            f"{total} requests to {options['endpoint']} at concurrency {options['concurrency']}, "
+            f"{'configured' if options['configured_llm'] else 'fake'} model"
+        )
+        self.stdout.write(f"{'stage':<10} {'count':>7} {'mean ms':>10} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}")
+        for stage in sorted(stages, key=lambda name: (name == "total", name)):
+            row = summarize(stages[stage])
+            self.stdout.write(
+                f"{stage:<10} {row['count']:>7} {row['mean']:>10.2f} {row['p50']:>10.2f} "
+                f"{row['p95']:>10.2f} {row['p99']:>10.2f}"
+            )
+        self.stdout.write(f"errors: {len(errors)}  wall: {wall:.2f}s  throughput: {total / wall if wall else 0:.1f} req/s")
@@ -0,0 +1,64 @@
+import statistics
+import time
+from django.core.management.base import BaseCommand, CommandError
+from conversations.management.benchmarking import percentile
+from conversations.functions import tools
+from conversations.replies import render_reply, reply_templates
+from conversations.services import Agent
+
+
+# Representative successful results, shaped like the real functions' output.
+SAMPLE_TURNS = {
+    "get_orders": (
+        "show my orders",
+        {"user_id": "1"},
+        "Order #1: Noise Cancelling Headphones x1 (pending)\nOrder #2: USB-C Cable x3 (completed)",
+    ),
+    "get_order": (
+        "where is order 2",
+        {"order_id": "2"},
+        {"id": 2, "quantity": 3, "status": "completed", "user": 1, "product": 4, "product_name": "USB-C Cable"},
+    ),
+    "make_order": (
+        "buy 2 of product 4",
+        {"user_id": "1", "product_id": "4", "quantity": "2"},
+        {"success": "Order created successfully.", "order": {
+            "id": 3, "quantity": 2, "status": "pending", "user": 1, "product": 4, "product_name": "USB-C Cable",
+        }},
+    ),
+}
+
+
+class Command(BaseCommand):
+    help = "Time the final reply stage with templates against model-written (rich) replies."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=5, help="Replies generated per function and mode.")
+
+    def handle(self, *args, **options):
+        iterations = options["iterations"]
+        self.stdout.write(f"{'function':<12} {'mode':<9} {'mean ms':>10} {'p50 ms':>10} {'p95 ms':>10}")
+
+        for function_name, (message, inputs, result) in SAMPLE_TURNS.items():
+            # Otherwise "template" would silently time a model call.
+            if render_reply(reply_templates, function_name, inputs, result) is None:
+                raise CommandError(f"The {function_name} template did not render its sample result.")
+            for mode in ("template", "rich"):
+                samples = [self._time_reply(function_name, message, inputs, result, mode == "rich") for _ in range(iterations)]
+                self.stdout.write(
+                    f"{function_name:<12} {mode:<9} {statistics.mean(samples):>10.2f} "
+                    f"{percentile(samples, 50):>10.2f} {percentile(samples, 95):>10.2f}"
+                )
+
+    def _time_reply(self, function_name, message, inputs, result, rich):
+        agent = Agent(
+            "1", message, tools,
+            reply_templates=reply_templates, rich_reply=rich,
+        )
+        agent.function_name = function_name
+        agent.inputs = dict(inputs)
+        agent.function_result = result
+
+        start = time.perf_counter()
+        agent._response()
+        return (time.perf_counter() - start) * 1000
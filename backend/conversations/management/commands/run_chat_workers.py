@@ -0,0 +1,42 @@
+import signal
+import time
+from django.core.management.base import BaseCommand
+from conversations.jobs import ChatWorkerPool
+from conversations.persistence import conversation_writer
+
+
+class Command(BaseCommand):
+    help = (
+        "Run chat turns queued with ?job=true / Prefer: respond-async. Starts a pool of worker threads "
+        "that claim jobs from the database; run several processes to scale out."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, help="Worker threads (default CHAT_JOBS_CONCURRENCY).")
+        parser.add_argument("--visibility-timeout", type=float, help="Seconds a claimed job is leased for.")
+        parser.add_argument("--max-attempts", type=int, help="Attempts before a job is failed.")
+        parser.add_argument("--retry-delay", type=float, help="Seconds before the first retry, doubled after each.")
+        parser.add_argument("--poll-interval", type=float, help="Seconds an idle worker waits between polls.")
+        parser.add_argument("--drain", action="store_true", help="Exit once the queue is empty.")
+
+    def handle(self, *args, **options):
+        pool = ChatWorkerPool.from_settings(
+            concurrency=options["concurrency"],
+            visibility_timeout=options["visibility_timeout"],
+            max_attempts=options["max_attempts"],
+            retry_delay=options["retry_delay"],
+            poll_interval=options["poll_interval"],
+        )
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: pool.stop())
+
+        self.stdout.write(f"Starting {pool.concurrency} chat workers{' (drain)' if options['drain'] else ''}.")
+        started = time.perf_counter()
+        pool.start(drain=options["drain"])
+        # Short joins keep the main thread responsive to signals.
+        while pool.is_alive():
+            pool.join(timeout=0.5)
+        conversation_writer.flush()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Processed {pool.processed} jobs in {elapsed:.2f}s."))
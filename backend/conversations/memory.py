@@ -0,0 +1,244 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+from .chat_agent import llm
+from .models import Conversation, ConversationSummary
+from .persistence import conversation_writer
+from . import metrics
+
+
+CHARS_PER_TOKEN = 4
+logger = logging.getLogger("conversations.memory")
+
+SPEAKERS = {"user": "User", "llm": "Assistant"}
+
+# Background folds: at most one per user at a time, on a small shared pool.
+_fold_pool = None
+_fold_pool_lock = threading.Lock()
+_folding = set()
+
+
+class ConversationMemory:
+    """
+    Multi-turn context for the agent's prompts at a bounded cost.
+
+    The last ``recent_messages`` messages are kept verbatim, as are older
+    ones not folded yet. Those are folded into a rolling summary stored in
+    ConversationSummary: once ``fold_batch`` messages have fallen out of the
+    recent window, one "summary" model call merges the oldest ``fold_batch``
+    of them into the summary, oldest first. Folding runs after the reply,
+    on a background thread (``fold_later``), never on the request path; a
+    long backlog (e.g. memory switched on for an existing user) is worked
+    off at most ``max_folds`` batches per turn, and nothing is marked
+    covered before it was summarized. The rendered context never exceeds
+    ``token_budget`` (estimated at ~4 characters per token), of which the
+    summary may take ``summary_tokens``. Turn 500 therefore costs about as
+    much as turn 5, plus one background summary call every ``fold_batch``
+    messages.
+
+    Loading is two indexed queries, the summary row and one window of
+    messages newer than it.
+    """
+
+    def __init__(self, user_id, recent_messages: int = 8, token_budget: int = 600,
+                 summary_tokens: int = 200, fold_batch: int = 8, max_folds: int = 4):
+        self.user_id = user_id
+        self.recent_messages = recent_messages
+        self.token_budget = token_budget
+        self.summary_tokens = summary_tokens
+        self.fold_batch = fold_batch
+        self.max_folds = max_folds
+        self.summary = ""
+        self.messages: List[dict] = []
+        self.fold_due = False
+        self.folded = 0
+
+    @classmethod
+    def from_settings(cls, user_id) -> Optional["ConversationMemory"]:
+        if not settings.AGENT_MEMORY_ENABLED:
+            return None
+        return cls(
+            user_id,
+            recent_messages=settings.AGENT_MEMORY_RECENT_MESSAGES,
+            token_budget=settings.AGENT_MEMORY_TOKEN_BUDGET,
+            summary_tokens=settings.AGENT_MEMORY_SUMMARY_TOKENS,
+            fold_batch=settings.AGENT_MEMORY_FOLD_BATCH,
+            max_folds=settings.AGENT_MEMORY_MAX_FOLDS,
+        )
+
+    def load(self, current_message: str = "") -> str:
+        """
+        Read the history and return the context block for the prompts (""
+        when there is no history). Sets ``fold_due`` when a full batch has
+        left the recent window. Makes no model calls.
+        """
+        # With buffered writes the message being answered was just queued,
+        # which needs no flush; an earlier one still queued (a quick follow-up
+        # to the last reply) does.
+        queued = conversation_writer.pending(self.user_id)
+        current_queued = bool(queued) and queued[-1] == ("user", current_message)
+        if len(queued) > current_queued:
+            conversation_writer.flush(timeout=1.0)
+            current_queued = False
+        stored = ConversationSummary.objects.filter(user_id=self.user_id).first()
+        covered_until = stored.covered_until if stored else 0
+        self.summary = stored.summary if stored else ""
+
+        # Ids, not timestamps: covered_until is an id cursor.
+        window = self.recent_messages + self.fold_batch + 1
+        rows = list(
+            Conversation.objects.filter(user_id=self.user_id, id__gt=covered_until)
+            .values("id", "direction", "message").order_by("-id")[:window]
+        )
+        rows.reverse()
+        # The message being answered may already be saved; it is not history.
+        if not current_queued and rows and rows[-1]["direction"] == "user" and rows[-1]["message"] == current_message:
+            rows.pop()
+        # Older messages not folded yet stay in the prompt until they are.
+        self.messages = rows
+        self.fold_due = len(rows) >= self.recent_messages + self.fold_batch
+        return self.render()
+
+    def fold(self) -> int:
+        """
+        Fold full batches that have left the recent window into the summary,
+        oldest first, at most ``max_folds`` of them. Returns the number of
+        messages folded. Safe to run concurrently with other workers: a
+        summary is only saved over the one it was built from.
+        """
+        unfolded = Conversation.objects.filter(user_id=self.user_id).values("id", "direction", "message")
+        for _ in range(self.max_folds):
+            stored = ConversationSummary.objects.filter(user_id=self.user_id).first()
+            covered_until = stored.covered_until if stored else 0
+            self.summary = stored.summary if stored else ""
+            rows = list(unfolded.filter(id__gt=covered_until).order_by("id")[:self.fold_batch + self.recent_messages])
+            if len(rows) < self.fold_batch + self.recent_messages:
+                break
+            if not self._fold(rows[:self.fold_batch], stored):
+                break
+        return self.folded
+
+    def fold_later(self):
+        """
+        Run ``fold`` on the background pool, unless this user already has a
+        fold queued or running.
+        """
+        key = str(self.user_id)
+        with _fold_pool_lock:
+            if key in _folding:
+                return
+            _folding.add(key)
+        try:
+            _pool().submit(self._fold_in_background, key)
+        except RuntimeError:
+            # The pool is shut down (interpreter exit); the next turn folds.
+            with _fold_pool_lock:
+                _folding.discard(key)
+
+    def _fold_in_background(self, key: str):
+        close_old_connections()
+        try:
+            self.fold()
+        except Exception:
+            logger.exception("Conversation summary fold failed", extra={"user_id": self.user_id})
+        finally:
+            close_old_connections()
+            with _fold_pool_lock:
+                _folding.discard(key)
+
+    def render(self) -> str:
+        """
+        Format the summary and recent messages within the token budget,
+        dropping the oldest messages first.
+        """
+        if not self.summary and not self.messages:
+            return ""
+        budget = self.token_budget * CHARS_PER_TOKEN
+        summary = _clip(self.summary, self.summary_tokens * CHARS_PER_TOKEN)
+        budget -= len(summary)
+
+        lines = []
+        for row in reversed(self.messages):
+            line = f"{SPEAKERS.get(row['direction'], row['direction'])}: {_clip(row['message'], budget // 2)}"
+            if len(line) > budget:
+                break
+            lines.append(line)
+            budget -= len(line)
+        lines.reverse()
+
+        block = "Conversation so far (context only, answer the latest message):\n"
+        if summary:
+            block += f"Summary of earlier messages: {summary}\n"
+        if lines:
+            block += "\n".join(lines) + "\n"
+        return block
+
+    def summary_prompt(self, messages: List[dict]) -> str:
+        transcript = "\n".join(
+            f"{SPEAKERS.get(row['direction'], row['direction'])}: {_clip(row['message'], 500)}" for row in messages
+        )
+        return (
+            "You maintain a running summary of a shopping assistant's conversation with a user. "
+            "Merge the new messages into the summary. Keep facts that later messages may refer to "
+            "(order and product ids, quantities, requests still open) and drop small talk. "
+            f"Answer with the summary only, at most {self.summary_tokens * CHARS_PER_TOKEN} characters.\n\n"
+            f"Current summary: {self.summary or '(none)'}\n\n"
+            f"New messages:\n{transcript}"
+        )
+
+    def _fold(self, batch: List[dict], stored: Optional[ConversationSummary]) -> bool:
+        prompt = self.summary_prompt(batch)
+        try:
+            response = llm.invoke(prompt, stage="summary")
+        except Exception as e:
+            # Keep the old summary; the same messages are retried next turn.
+            logger.warning("Conversation summary failed", extra={"user_id": self.user_id, "error": str(e)})
+            return False
+        _count_tokens(prompt, response)
+
+        summary = _clip(response.content.strip(), self.summary_tokens * CHARS_PER_TOKEN)
+        covered_until = batch[-1]["id"]
+        if stored is not None:
+            saved = ConversationSummary.objects.filter(
+                user_id=self.user_id, covered_until=stored.covered_until,
+            ).update(summary=summary, covered_until=covered_until, updated_at=timezone.now())
+        else:
+            try:
+                with transaction.atomic():
+                    ConversationSummary.objects.create(user_id=self.user_id, summary=summary, covered_until=covered_until)
+                saved = True
+            except IntegrityError:
+                saved = False
+        if not saved:
+            logger.info("Conversation summary changed meanwhile, fold dropped", extra={"user_id": self.user_id})
+            return False
+        self.summary = summary
+        self.folded += len(batch)
+        return True
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _fold_pool
+    with _fold_pool_lock:
+        if _fold_pool is None:
+            _fold_pool = ThreadPoolExecutor(max_workers=settings.AGENT_MEMORY_FOLD_WORKERS, thread_name_prefix="memory-fold")
+        return _fold_pool
+
+
+def _count_tokens(prompt: str, response):
+    # Background folds belong to no turn, so they go straight to the counters.
+    usage = getattr(response, "usage", None) or {}
+    metrics.llm_tokens.inc(usage.get("prompt_tokens", len(prompt) // CHARS_PER_TOKEN), stage="summary", kind="prompt")
+    metrics.llm_tokens.inc(
+        usage.get("completion_tokens", len(response.content or "") // CHARS_PER_TOKEN), stage="summary", kind="completion",
+    )
+
+
+def _clip(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    return text[:max(limit - 3, 0)] + "..."
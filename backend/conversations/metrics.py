@@ -0,0 +1,192 @@
+import bisect
+import logging
+from threading import Lock
+from typing import Dict, Iterable, Tuple
+
+
+logger = logging.getLogger("conversations.metrics")
+
+# Seconds, from a cache hit to a slow model call.
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100)
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[tuple, float] = {}
+        self._lock = Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def expose(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, key)} {value}")
+        return "\n".join(lines)
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, buckets: Iterable[float], labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self.labelnames = tuple(labelnames)
+        self._series: Dict[tuple, list] = {}
+        self._lock = Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._series.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0])
+            counts[index] += 1
+            self._series[key][1] = total + value
+
+    def expose(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    le_label = f'le="{le}"'
+                    lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le_label)} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return "\n".join(lines)
+
+
+stage_seconds = Histogram(
+    "chat_stage_duration_seconds", "Wall time of each chat pipeline stage.", DURATION_BUCKETS, ["stage"],
+)
+stage_queries = Histogram(
+    "chat_stage_db_queries", "Database queries issued by each chat pipeline stage.", QUERY_BUCKETS, ["stage"],
+)
+llm_tokens = Counter(
+    "chat_llm_tokens_total", "LLM tokens used by each chat pipeline stage.", ["stage", "kind"],
+)
+turns = Counter(
+    "chat_turns_total", "Chat turns handled, by resolved function and outcome.", ["function", "outcome"],
+)
+tokens_saved = Counter(
+    "chat_result_tokens_saved_total", "Prompt tokens saved by compacting function results.", ["function"],
+)
+jobs = Counter(
+    "chat_jobs_total", "Background chat job attempts, by outcome.", ["outcome"],
+)
+
+registry = [stage_seconds, stage_queries, llm_tokens, turns, tokens_saved, jobs]
+
+
+def server_timing(timings: Dict[str, float]) -> str:
+    """
+    Format stage timings (milliseconds) as a ``Server-Timing`` header value.
+    """
+    return ", ".join(f"{stage};dur={elapsed:.1f}" for stage, elapsed in timings.items())
+
+
+def record_turn(agent):
+    """
+    Feed one finished chat turn into the histograms and the structured log.
+    """
+    for stage, elapsed in agent.timings.items():
+        stage_seconds.observe(elapsed / 1000, stage=stage)
+    for stage, count in agent.queries.items():
+        stage_queries.observe(count, stage=stage)
+    for stage, usage in agent.tokens.items():
+        for kind, count in usage.items():
+            llm_tokens.inc(count, stage=stage, kind=kind)
+    turns.inc(function=agent.function_name or "none", outcome="error" if agent.error else "ok")
+    if agent.compaction:
+        tokens_saved.inc(agent.compaction["saved_tokens"], function=agent.function_name or "none")
+
+    logger.info(
+        "chat turn",
+        extra={
+            "user_id": agent.user_id,
+            "function": agent.function_name,
+            "mode": agent.mode,
+            "routed": agent.routed,
+            "error": bool(agent.error),
+            "stage_ms": {stage: round(elapsed, 1) for stage, elapsed in agent.timings.items()},
+            "stage_queries": dict(agent.queries),
+            "stage_tokens": dict(agent.tokens),
+            "result_compaction": agent.compaction,
+        },
+    )
+
+
+def router_block(snapshot: dict) -> str:
+    """
+    Expose IntentRouter.snapshot() counters.
+    """
+    lines = [
+        "# HELP chat_router_messages_total Messages seen by the intent router, by result.",
+        "# TYPE chat_router_messages_total counter",
+    ]
+    for result in ("hits", "misses", "ambiguous"):
+        lines.append(f'chat_router_messages_total{{result="{result}"}} {snapshot[result]}')
+    lines += [
+        "# HELP chat_router_function_hits_total Messages routed to each function without a model call.",
+        "# TYPE chat_router_function_hits_total counter",
+    ]
+    for function_name, count in sorted(snapshot["functions"].items()):
+        lines.append(f'chat_router_function_hits_total{{function="{function_name}"}} {count}')
+    return "\n".join(lines)
+
+
+def cache_block(snapshot: dict) -> str:
+    """
+    Expose AgentCache.snapshot() counters.
+    """
+    lines = [
+        "# HELP chat_agent_cache_lookups_total Intent and input cache lookups, by result.",
+        "# TYPE chat_agent_cache_lookups_total counter",
+    ]
+    for cache in ("intents", "inputs"):
+        for result, key in (("hit", "hits"), ("miss", "misses")):
+            lines.append(f'chat_agent_cache_lookups_total{{cache="{cache}",result="{result}"}} {snapshot[cache][key]}')
+    return "\n".join(lines)
+
+
+def admission_block(snapshot: dict) -> str:
+    """
+    Expose AdmissionController.snapshot() slots and refusals.
+    """
+    lines = [
+        "# HELP chat_admission_active Chat turns holding a concurrency slot.",
+        "# TYPE chat_admission_active gauge",
+        f"chat_admission_active {snapshot['active']}",
+        "# HELP chat_admission_waiting Chat turns waiting for a concurrency slot.",
+        "# TYPE chat_admission_waiting gauge",
+        f"chat_admission_waiting {snapshot['waiting']}",
+        "# HELP chat_admission_rejected_total Chat turns refused with 429, by reason.",
+        "# TYPE chat_admission_rejected_total counter",
+    ]
+    for reason, count in sorted(snapshot["rejected"].items()):
+        lines.append(f'chat_admission_rejected_total{{reason="{reason}"}} {count}')
+    return "\n".join(lines)
+
+
+def expose(extra_collectors=()) -> str:
+    """
+    Render every metric in the Prometheus text exposition format.
+    """
+    blocks = [metric.expose() for metric in registry]
+    blocks.extend(collector() for collector in extra_collectors)
+    return "\n".join(block for block in blocks if block) + "\n"
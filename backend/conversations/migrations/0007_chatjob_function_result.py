@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:53
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conversations', '0006_chatjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatjob',
+            name='function_inputs',
+            field=models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True),
+        ),
+        migrations.AddField(
+            model_name='chatjob',
+            name='function_name',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='chatjob',
+            name='function_result',
+            field=models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True),
+        ),
+    ]
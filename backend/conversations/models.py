@@ -1,4 +1,7 @@
+import uuid
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.utils import timezone
 from users.models import User
 
 class Conversation(models.Model):
@@ -8,5 +11,89 @@ class Conversation(models.Model):
     message = models.TextField()
     direction = models.CharField(max_length=10, choices=DIRECTION_CHOICES)
 
+    class Meta:
+        # Serves "a user's history, newest first" as one index range scan.
+        indexes = [models.Index(fields=['user', 'timestamp', 'id'], name='conversation_user_ts_idx')]
+
     def __str__(self):
         return f"{self.user.name} ({self.direction})"
+
+
+class ConversationSummary(models.Model):
+    """
+    Rolling summary of a user's older chat messages, maintained by
+    conversations.memory. ``covered_until`` is the id of the last message
+    folded into ``summary``; newer messages are still read verbatim.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='conversation_summary')
+    summary = models.TextField(blank=True)
+    covered_until = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Summary for user {self.user_id} (through message {self.covered_until})"
+
+
+class ConversationArchive(models.Model):
+    """
+    Cold storage for old chat messages: one zlib-compressed JSON segment of
+    consecutive messages of one user. Written by the archive_conversations
+    command and read back by conversations.history; see conversations.archive.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
+    first_id = models.BigIntegerField()
+    last_id = models.BigIntegerField()
+    first_timestamp = models.DateTimeField()
+    last_timestamp = models.DateTimeField()
+    message_count = models.PositiveIntegerField()
+    data = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['user', 'last_timestamp'], name='conversation_archive_user_idx')]
+
+    def __str__(self):
+        return f"Archive of user {self.user_id}: {self.message_count} messages through {self.last_timestamp}"
+
+
+class ChatJob(models.Model):
+    """
+    One chat turn queued for a background worker; see conversations.jobs.
+
+    ``available_at`` is when a worker may next claim the job: creation time
+    for a queued job, the end of the lease for a running one (so a job whose
+    worker died is picked up again once the lease expires) and the retry
+    time after a failed attempt.
+
+    Once an attempt has run the turn's function, its name, inputs and
+    result are kept here, so a retried attempt only writes the reply and
+    never places an order twice.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    message = models.TextField()
+    rich = models.BooleanField(null=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    reply = models.TextField(blank=True)
+    error = models.TextField(blank=True)
+    request_id = models.CharField(max_length=64, blank=True)
+    function_name = models.CharField(max_length=100, blank=True)
+    function_inputs = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    function_result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'available_at'], name='chatjob_claim_idx')]
+
+    def __str__(self):
+        return f"Chat job {self.id} for user {self.user_id} ({self.status})"
@@ -0,0 +1,164 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from django.conf import settings
+from django.db import close_old_connections
+from .models import Conversation
+
+
+logger = logging.getLogger("conversations.persistence")
+
+SYNC_MODE = "sync"
+BUFFERED_MODE = "buffered"
+
+
+class ConversationWriter:
+    """
+    Saves chat messages either immediately ("sync") or through a write-behind
+    buffer ("buffered") that a background thread drains with ``bulk_create``.
+
+    The buffer flushes every ``flush_interval`` seconds or as soon as
+    ``max_batch`` rows are waiting, whichever comes first. One FIFO queue and
+    one writer thread keep rows in submission order, so each user's messages
+    are inserted in the order they were sent. Pending rows are flushed at
+    interpreter exit. Readers that need a user's latest messages (the
+    agent's memory) check ``pending`` and ``flush`` when needed.
+    """
+
+    def __init__(self, mode: str = SYNC_MODE, flush_interval: float = 0.2, max_batch: int = 100):
+        if mode not in (SYNC_MODE, BUFFERED_MODE):
+            raise ValueError(f"Unknown conversation write mode '{mode}'")
+        self.mode = mode
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._closed = False
+        # Queued, not yet written rows per user id, oldest first.
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls) -> "ConversationWriter":
+        return cls(
+            mode=settings.CONVERSATION_WRITE_MODE,
+            flush_interval=settings.CONVERSATION_FLUSH_INTERVAL,
+            max_batch=settings.CONVERSATION_FLUSH_BATCH_SIZE,
+        )
+
+    def save(self, user_id, message: str, direction: str):
+        """
+        Persist one message, now or on the next flush depending on the mode.
+        """
+        if self.mode == SYNC_MODE or self._closed:
+            Conversation.objects.create(user_id=user_id, message=message, direction=direction)
+            return
+        self._enqueue(Conversation(user_id=user_id, message=message, direction=direction))
+
+    async def asave(self, user_id, message: str, direction: str):
+        """
+        Async counterpart of save(); enqueueing never blocks the event loop.
+        """
+        if self.mode == SYNC_MODE or self._closed:
+            await Conversation.objects.acreate(user_id=user_id, message=message, direction=direction)
+            return
+        self._enqueue(Conversation(user_id=user_id, message=message, direction=direction))
+
+    def _enqueue(self, row):
+        self._ensure_started()
+        key = str(row.user_id)
+        with self._pending_lock:
+            self._pending.setdefault(key, []).append(row)
+        self._queue.put(row)
+
+    def pending(self, user_id) -> list:
+        """
+        This user's queued, not yet written messages as (direction, message)
+        pairs, oldest first. Only sees this process's buffer.
+        """
+        with self._pending_lock:
+            return [(row.direction, row.message) for row in self._pending.get(str(user_id), ())]
+
+    def flush(self, timeout: float = None):
+        """
+        Block until every message queued before this call is written.
+        """
+        if self._thread is None:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def close(self):
+        """
+        Flush what is pending and stop the writer thread.
+        """
+        if self._thread is None or self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="conversation-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch, waiters = [], []
+            deadline = None
+            while len(batch) < self.max_batch:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                    break
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+
+            if batch:
+                self._write(batch)
+            for waiter in waiters:
+                waiter.set()
+
+    def _write(self, batch):
+        close_old_connections()
+        try:
+            Conversation.objects.bulk_create(batch)
+        except Exception as e:
+            logger.warning("Conversation batch insert failed, retrying row by row", extra={"rows": len(batch), "error": str(e)})
+            for row in batch:
+                try:
+                    row.save()
+                except Exception as row_error:
+                    logger.error("Dropped conversation message", extra={"user_id": row.user_id, "error": str(row_error)})
+        finally:
+            close_old_connections()
+            with self._pending_lock:
+                # Rows are written in queue order, so each is its user's oldest.
+                for row in batch:
+                    key = str(row.user_id)
+                    rows = self._pending.get(key)
+                    if rows:
+                        rows.pop(0)
+                        if not rows:
+                            del self._pending[key]
+
+
+conversation_writer = ConversationWriter.from_settings()
@@ -0,0 +1,46 @@
+from typing import Any, Callable, Dict, Optional
+
+
+def render_get_orders(inputs: dict, result: Any) -> str:
+    if result == "You have no orders.":
+        return "You don't have any orders yet."
+    return f"Here are your orders:\n{result}"
+
+
+def render_get_order(inputs: dict, result: dict) -> str:
+    return (
+        f"Order #{result['id']} is {result['status']}: "
+        f"{result['quantity']} item(s) of {result['product_name']} (product #{result['product']})."
+    )
+
+
+def render_make_order(inputs: dict, result: dict) -> str:
+    order = result["order"]
+    return (
+        f"Your order #{order['id']} for {order['quantity']} item(s) of {order['product_name']} "
+        f"(product #{order['product']}) has been placed. Its status is {order['status']}."
+    )
+
+
+# Successful results of these functions are rendered locally instead of
+# asking the model to rephrase them.
+reply_templates: Dict[str, Callable[[dict, Any], str]] = {
+    "get_orders": render_get_orders,
+    "get_order": render_get_order,
+    "make_order": render_make_order,
+}
+
+
+def render_reply(templates: Dict[str, Callable], function_name: str, inputs: dict, result: Any) -> Optional[str]:
+    """
+    Render a reply from a template, or return None when the model should write it.
+    """
+    template = templates.get(function_name)
+    if template is None:
+        return None
+    if isinstance(result, dict) and "error" in result:
+        return None
+    try:
+        return template(inputs, result)
+    except (KeyError, TypeError):
+        return None
@@ -0,0 +1,90 @@
+import re
+from threading import Lock
+from typing import Dict, Optional, Tuple
+
+
+def normalize_message(message: str) -> str:
+    """
+    Lowercase, collapse whitespace and drop trailing punctuation.
+    """
+    text = " ".join(str(message).lower().split())
+    return text.rstrip(" .!?")
+
+
+class IntentRouter:
+    """
+    Deterministic router that answers common messages without a model call.
+
+    Each entry in ``function_descriptions`` may declare ``"routes"``: regular
+    expressions that must match the whole normalized message. Named groups
+    become function inputs, e.g. ``order #?(?P<order_id>\\d+)``. A message is
+    routed only when the routes of exactly one function match it; anything
+    else falls through to the LLM.
+    """
+
+    def __init__(self, function_descriptions: Dict[str, dict]):
+        self.routes = [
+            (name, re.compile(pattern, re.IGNORECASE))
+            for name, details in function_descriptions.items()
+            for pattern in details.get("routes", [])
+        ]
+        self._lock = Lock()
+        self.reset_stats()
+
+    def route(self, message: str) -> Optional[Tuple[str, dict]]:
+        """
+        Return ``(function_name, inputs)`` for a confident match, else None.
+        """
+        text = normalize_message(message)
+        matches = {}
+        for name, pattern in self.routes:
+            if name in matches:
+                continue
+            match = pattern.fullmatch(text)
+            if match:
+                matches[name] = {k: v for k, v in match.groupdict().items() if v is not None}
+
+        with self._lock:
+            self.stats["total"] += 1
+            if len(matches) == 1:
+                name, inputs = next(iter(matches.items()))
+                self.stats["hits"] += 1
+                self.stats["functions"][name] = self.stats["functions"].get(name, 0) + 1
+                return name, inputs
+            if matches:
+                self.stats["ambiguous"] += 1
+            else:
+                self.stats["misses"] += 1
+        return None
+
+    def record_fallback(self, function_name: str):
+        """
+        Count a routed message whose inputs still needed the model.
+        """
+        with self._lock:
+            fallbacks = self.stats["input_fallbacks"]
+            fallbacks[function_name] = fallbacks.get(function_name, 0) + 1
+
+    def snapshot(self) -> dict:
+        """
+        Return a copy of the counters with the current hit rate.
+        """
+        with self._lock:
+            stats = {
+                **self.stats,
+                "functions": dict(self.stats["functions"]),
+                "input_fallbacks": dict(self.stats["input_fallbacks"]),
+            }
+        stats["hit_rate"] = round(stats["hits"] / stats["total"], 4) if stats["total"] else 0.0
+        return stats
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = {
+                "total": 0,
+                "hits": 0,
+                "misses": 0,
+                "ambiguous": 0,
+                "functions": {},
+                "input_fallbacks": {},
+            }
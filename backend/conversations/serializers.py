@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Conversation
+from .models import ChatJob, Conversation
 from drf_spectacular.utils import extend_schema_serializer, OpenApiExample
 
 
@@ -21,3 +21,9 @@ class ConversationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Conversation
         fields = '__all__'
+
+
+class ChatJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ChatJob
+        fields = ['id', 'status', 'attempts', 'reply', 'error', 'created_at', 'started_at', 'finished_at']
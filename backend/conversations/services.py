@@ -1,28 +1,57 @@
+import hashlib
 import json
-from typing import Dict, Callable, Any
-from pydantic import BaseModel
+import logging
+import re
+import time
+from contextlib import contextmanager
+from typing import Dict, Callable, Any, Optional
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
 from .chat_agent import llm
 from .functions import get_order, get_orders, update_profile
+from .router import IntentRouter, normalize_message
+from .cache import AgentCache
+from .tools import ToolRegistry
+from .memory import ConversationMemory
+from .compaction import ResultCompactor, encode, result_compactor
+from .replies import render_reply
+from .signals import agent_finished
+from . import log
 
 
+logger = logging.getLogger("conversations.agent")
+
+
+# "three_call" asks the model for the intent and the inputs separately,
+# "combined" asks for both in one round trip and falls back to the
+# three-call path when the combined answer does not validate.
+THREE_CALL_MODE = "three_call"
+COMBINED_MODE = "combined"
+PIPELINE_MODES = (THREE_CALL_MODE, COMBINED_MODE)
 
 
 class Agent:
+    count_queries = True
+
     def __init__(
             self,
             user_id: str,
             message: str,
-            function_descriptions: Dict[str, str],
-            function_schemas: Dict[str, BaseModel],
-            function_inputs: Dict[str, Dict[str, str]],
-            function_registry: Dict[str, Callable[..., Any]],
+            tools: ToolRegistry,
+            mode: Optional[str] = None,
+            router: Optional[IntentRouter] = None,
+            cache: Optional[AgentCache] = None,
+            reply_templates: Optional[Dict[str, Callable[..., str]]] = None,
+            rich_reply: Optional[bool] = None,
+            memory: Optional[ConversationMemory] = None,
+            compactor: Optional[ResultCompactor] = None,
+            on_function_result: Optional[Callable[[str, dict, Any], None]] = None,
     ):
         self.user_id = user_id
         self.message = message
-        self.function_descriptions = function_descriptions
-        self.function_schemas = function_schemas
-        self.function_inputs = function_inputs
-        self.function_registry = function_registry
+        # Function catalog, schemas and the prompt fragments built from them.
+        self.tools = tools
         self.full_prompt = f"{message}"
         self.user_id = user_id
         self.function_name = ""
@@ -30,6 +59,27 @@ class Agent:
         self.initial_prompt = ""
         self.function_result = {}
         self.error = ""
+        self.mode = mode or settings.AGENT_PIPELINE_MODE
+        if self.mode not in PIPELINE_MODES:
+            raise ValueError(f"Unknown agent pipeline mode '{self.mode}'")
+        self.router = router
+        self.routed = False
+        self.cache = cache
+        self.catalog_hash = None
+        if cache is not None:
+            self.catalog_hash = cache.bind_hash(tools.catalog_hash)
+        self.inputs_cached = False
+        self.reply_templates = reply_templates or {}
+        self.rich_reply = settings.AGENT_RICH_REPLIES if rich_reply is None else rich_reply
+        self.memory = memory
+        self.memory_context = ""
+        self.compactor = compactor or result_compactor
+        self.compaction = {}
+        # Told (name, inputs, result) as soon as the function has run.
+        self.on_function_result = on_function_result
+        self.timings = {}
+        self.queries = {}
+        self.tokens = {}
     
 
     def run(self) -> dict:
@@ -37,54 +87,310 @@ class Agent:
         Run the agent to process the message and return the response data.
         """
         self._log("Received request", self.full_prompt)
+        self._load_memory()
 
-        if not self._detect_intent():
+        if not self._resolve_function():
             return self._response()
 
-        if not self._extract_inputs():
+        if not self._execute_function():
             return self._response()
 
+        return self._response()
+
+    def run_stream(self):
+        """
+        Run the agent and yield ``(event, data)`` pairs as each stage finishes.
+
+        Emits "intent" once the function and inputs are known, "function"
+        after it ran, one "token" per chunk of the final reply and a closing
+        "done" carrying the full reply.
+        """
+        self._log("Received request", self.full_prompt)
+        self._load_memory()
+
+        resolved = self._resolve_function()
+        if self.function_name:
+            yield "intent", {"function": self.function_name, "inputs": self.inputs}
+
+        if resolved and self._execute_function():
+            yield "function", {"function": self.function_name, "ok": not self._result_has_error()}
+
+        chunks = []
+        for chunk in self._response_stream():
+            chunks.append(chunk)
+            yield "token", {"text": chunk}
+        yield "done", {"message": "".join(chunks).strip()}
+
+    def _load_memory(self):
+        """
+        Fetch the earlier turns the input and reply prompts are given.
+        """
+        if self.memory is None:
+            return
+        with self.timed("memory"):
+            self.memory_context = self.memory.load(self.full_prompt)
+
+    def _result_has_error(self) -> bool:
+        return isinstance(self.function_result, dict) and "error" in self.function_result
+
+    def _resolve_function(self) -> bool:
+        """
+        Work out the function to call and its validated inputs.
+        """
+        if self._route_intent():
+            if self._check_routed_inputs():
+                return True
+            # The rule knows the function but not every input, ask the model.
+            self.router.record_fallback(self.function_name)
+            if not self._extract_inputs():
+                return False
+            return self._validate_inputs()
+
+        cached = self._use_cached_intent()
+        if self.mode == COMBINED_MODE and not cached:
+            if self._detect_intent_and_inputs():
+                self._store_intent()
+                self._store_inputs()
+                return True
+            self._log("Combined extraction failed, falling back", self.error)
+            self.function_name = ""
+            self.inputs = {}
+            self.error = ""
+
+        if not cached and not self._detect_intent():
+            return False
+
+        if not self._extract_inputs():
+            return False
+
         if not self._validate_inputs():
-            return self._response()
+            return False
+        self._store_inputs()
+        return True
 
-        if not self._execute_function():
-            return self._response()
+    def _use_cached_intent(self) -> bool:
+        """
+        Take the function name from the cache when this message was seen before.
+        """
+        if self.cache is None:
+            return False
+        function_name = self.cache.get_intent(self.catalog_hash, self.full_prompt)
+        if function_name is None:
+            return False
+        self.function_name = function_name
+        self._log("Intent cached", function_name)
+        return True
 
-        return self._response()
+    def _store_intent(self):
+        if self.cache is not None:
+            self.cache.set_intent(self.catalog_hash, self.full_prompt, self.function_name)
+
+    def _use_cached_inputs(self) -> bool:
+        """
+        Take this user's inputs from the cache when this message was seen before.
+        """
+        if self.cache is None:
+            return False
+        # Inputs found in the message itself are shared across turns; ones
+        # read from earlier turns ("cancel that one") only for the same context.
+        inputs = self.cache.get_inputs(self.catalog_hash, self.user_id, self.function_name, self.full_prompt)
+        if inputs is None and self.memory_context:
+            inputs = self.cache.get_inputs(
+                self.catalog_hash, self.user_id, self.function_name, self.full_prompt, self._context_key(),
+            )
+        if inputs is None:
+            return False
+        self.inputs = inputs
+        self.inputs_cached = True
+        self._log("Function inputs cached", inputs)
+        return True
+
+    def _store_inputs(self):
+        """
+        Remember validated inputs that came from the model.
+        """
+        if self.cache is None or self.inputs_cached:
+            return
+        context = "" if self._inputs_from_message() else self._context_key()
+        self.cache.set_inputs(self.catalog_hash, self.user_id, self.function_name, self.full_prompt, self.inputs, context)
+
+    def _inputs_from_message(self) -> bool:
+        """
+        Whether every input value appears in the message (or is the caller's
+        user_id), so no earlier turn was needed to extract it.
+        """
+        message = normalize_message(self.full_prompt)
+        values = []
+        for name, value in self.inputs.items():
+            values.extend(value.values() if isinstance(value, dict) else [value])
+            if name == "user_id" and str(value) == str(self.user_id):
+                values.pop()
+        return all(
+            value in (None, "") or re.search(rf"\b{re.escape(normalize_message(str(value)))}\b", message)
+            for value in values
+        )
+
+    def _context_key(self) -> str:
+        return hashlib.sha256(self.memory_context.encode()).hexdigest()[:16] if self.memory_context else ""
+
+    @contextmanager
+    def timed(self, stage: str):
+        """
+        Accumulate the wall time (milliseconds) and the database queries of a
+        pipeline stage. Queries are counted on this thread's connection only.
+        """
+        queries = 0
+
+        def count_query(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        try:
+            if self.count_queries:
+                with connection.execute_wrapper(count_query):
+                    yield
+            else:
+                yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            self.timings[stage] = self.timings.get(stage, 0.0) + elapsed
+            if queries:
+                self.queries[stage] = self.queries.get(stage, 0) + queries
+
+    def _count_tokens(self, stage: str, prompt: str, response):
+        """
+        Add a model call's token usage to the stage, estimating ~4 characters
+        per token when the backend does not report usage.
+        """
+        usage = getattr(response, "usage", None) or {}
+        content = getattr(response, "content", response) or ""
+        tokens = self.tokens.setdefault(stage, {"prompt": 0, "completion": 0})
+        tokens["prompt"] += usage.get("prompt_tokens", len(prompt) // 4)
+        tokens["completion"] += usage.get("completion_tokens", len(content) // 4)
         
     def _log(self, label, data):
         """
-        Log messages for debugging purposes.
+        Debug record for one pipeline step. Costs a level check unless DEBUG
+        is on; ``data`` is only written for sampled requests, redacted.
+        """
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(label, extra={"user_id": self.user_id, "function": self.function_name or None, **log.payload(data)})
+
+    def _warn(self, label, error):
+        logger.warning(label, extra={"user_id": self.user_id, "function": self.function_name or None, "error": str(error)})
+
+
+    def _route_intent(self) -> bool:
+        """
+        Try the deterministic router before asking the model for the intent.
         """
-        print(f"[CHAT] {label}: {json.dumps(data, indent=2) if not isinstance(data, str) else data}", flush=True)
+        if self.router is None:
+            return False
 
+        with self.timed("route"):
+            routed = self.router.route(self.full_prompt)
+        if not routed:
+            return False
+
+        self.function_name, self.inputs = routed
+        self.routed = True
+        self._log("Intent routed", {"function": self.function_name, "inputs": self.inputs})
+        return True
+
+    def _check_routed_inputs(self) -> bool:
+        """
+        Fill the caller's user_id into routed inputs and validate them.
+        """
+        schema = self.tools.schemas.get(self.function_name)
+        if schema is not None and "user_id" in schema.model_fields:
+            self.inputs.setdefault("user_id", self.user_id)
+        with self.timed("validate"):
+            return self.check_inputs(self.function_name, self.inputs)
 
     def _detect_intent(self) -> bool:
         """
         Detect the intent of the user message.
         """
-        result = self.get_intent(self.full_prompt)
+        with self.timed("intent"):
+            result = self.get_intent(self.full_prompt)
+        if not self._apply_intent(result):
+            return False
+        self._store_intent()
+        return True
+
+    def _apply_intent(self, result) -> bool:
+        """
+        Parse the model's intent answer.
+        """
         self._log("Intent detected", result)
 
         try:
             result = json.loads(result)
             self.function_name = result.get("function")
-            return self.function_name in self.function_descriptions
-        except json.JSONDecodeError as e:
+            return self.function_name in self.tools.descriptions
+        except (TypeError, json.JSONDecodeError) as e:
+            self.error = f"JSON decode error: {e}"
+            return False
+
+    def _detect_intent_and_inputs(self) -> bool:
+        """
+        Detect the intent and extract the inputs with a single model call.
+        """
+        with self.timed("combined"):
+            result = self.get_intent_and_inputs(self.full_prompt)
+        if not self._apply_intent_and_inputs(result):
+            return False
+        return self._validate_inputs()
+
+    def _apply_intent_and_inputs(self, result) -> bool:
+        """
+        Parse the model's combined function and inputs answer.
+        """
+        self._log("Intent and inputs detected", result)
+
+        try:
+            result = json.loads(result)
+        except (TypeError, json.JSONDecodeError) as e:
             self.error = f"JSON decode error: {e}"
             return False
+
+        if not isinstance(result, dict):
+            self.error = "Combined output is not a JSON object"
+            return False
+
+        function_name = result.get("function")
+        inputs = result.get("inputs") or {}
+        if function_name not in self.tools.descriptions or not isinstance(inputs, dict):
+            self.error = "Combined output does not name a known function"
+            return False
+
+        self.function_name = function_name
+        self.inputs = inputs
+        return True
         
     def _extract_inputs(self) -> bool:
         """
         Extract function inputs from the user message.
         """
-        inputs_result = self.get_function_inputs(self.full_prompt, self.function_name)
+        if self._use_cached_inputs():
+            return True
+
+        with self.timed("inputs"):
+            inputs_result = self.get_function_inputs(self.full_prompt, self.function_name)
+        return self._apply_inputs(inputs_result)
+
+    def _apply_inputs(self, inputs_result) -> bool:
+        """
+        Parse the model's extracted inputs.
+        """
         self._log("Function inputs", inputs_result)
 
         try:
             self.inputs = json.loads(inputs_result)
             return True
-        except json.JSONDecodeError as e:
+        except (TypeError, json.JSONDecodeError) as e:
             self.error = f"JSON decode error: {e}"
             return False
         
@@ -92,7 +398,8 @@ class Agent:
         """
         Validate the extracted inputs against the function schema.
         """
-        is_valid = self.check_inputs(self.function_name, self.inputs)
+        with self.timed("validate"):
+            is_valid = self.check_inputs(self.function_name, self.inputs)
         if not is_valid:
             self.error = "Invalid inputs for the function"
         return is_valid
@@ -102,17 +409,86 @@ class Agent:
         Execute the function with the validated inputs.
         """
         try:
-            self.function_result = self.execute_function(self.function_name, self.inputs)
-            self._log("Function result", self.function_result)
-            return True
+            with self.timed("execute"):
+                self.function_result = self.execute_function(self.function_name, self.inputs)
         except Exception as e:
             self.error = f"Error executing function: {e}"
             return False
-        
+        self._log("Function result", self.function_result)
+        if self.on_function_result is not None:
+            self.on_function_result(self.function_name, self.inputs, self.function_result)
+        return True
+
+    def replay(self, function_name: str, inputs: dict, function_result: Any) -> dict:
+        """
+        Write the reply for a function that already ran, e.g. in an earlier
+        attempt of a background job. Nothing is executed again.
+        """
+        self._log("Replaying function result", self.full_prompt)
+        self._load_memory()
+        self.function_name = function_name
+        self.inputs = dict(inputs or {})
+        self.function_result = function_result
+        return self._response()
+
     def _response(self) -> dict:
         """
         Generate the final response data.
         """
+        self._log_response_data()
+        response = self._template_reply()
+        if response is not None:
+            return response
+
+        with self.timed("final"):
+            response = self.final_ai_output(
+                self.function_name,
+                self.inputs,
+                self.initial_prompt,
+                self.function_result,
+                self.error
+            )
+        self._finish()
+        return response
+
+    def _response_stream(self):
+        """
+        Stream the final response chunk by chunk.
+        """
+        response = self._template_reply()
+        if response is not None:
+            yield response
+            return
+
+        start = time.perf_counter()
+        try:
+            yield from self.final_ai_output_stream(
+                self.function_name,
+                self.inputs,
+                self.initial_prompt,
+                self.function_result,
+                self.error
+            )
+        finally:
+            self.timings["final"] = self.timings.get("final", 0.0) + (time.perf_counter() - start) * 1000
+            self._finish()
+
+    def _template_reply(self) -> Optional[str]:
+        """
+        Render successful structured results locally, skipping the final model call.
+        """
+        if self.rich_reply or self.error:
+            return None
+
+        with self.timed("template"):
+            response = render_reply(self.reply_templates, self.function_name, self.inputs, self.function_result)
+        if response is not None:
+            self._finish()
+        return response
+
+    def _log_response_data(self):
+        if not logger.isEnabledFor(logging.DEBUG):
+            return
         response_data = {
             "function_name": self.function_name,
             "inputs": self.inputs,
@@ -120,21 +496,39 @@ class Agent:
             "function_result": self.function_result,
             "error": self.error
         }
-        print(response_data, flush=True)
-        response = self.final_ai_output(
-            self.function_name,
-            self.inputs,
-            self.initial_prompt,
-            self.function_result,
-            self.error
-        )
-        return response
+        self._log("Turn data", response_data)
 
+    def _finish(self):
+        """
+        Report the turn's stage timings once the reply is ready.
+        """
+        self._log(f"Stage timings ms ({self.mode})", {k: round(v, 1) for k, v in self.timings.items()})
+        agent_finished.send(sender=self.__class__, agent=self)
+        if self.memory is not None and self.memory.fold_due:
+            self.memory.fold_later()
+
+
+    def _memory_block(self) -> str:
+        return f"{self.memory_context}\n" if self.memory_context else ""
 
     def get_intent(self, prompt: str)->dict:
         """
         Determine the intent of the user input based on the provided prompt.
         """
+        full_prompt = self.intent_prompt(prompt)
+        try:
+            response = llm.invoke(full_prompt, stage="intent")
+            self._count_tokens("intent", full_prompt, response)
+            self._log("Intent answer", response.content)
+            return response.content.strip()  # Assuming the response is a JSON string
+        except Exception as e:
+            self._warn("Intent call failed", e)
+            return {"error": str(e)}
+
+    def intent_prompt(self, prompt: str) -> str:
+        """
+        Build the prompt that asks the model for the function name.
+        """
         system_instruction = (
         "You are an AI assistant that helps route user queries to backend functions. "
         "Your job is to extract the correct function name from the user's message "
@@ -144,19 +538,61 @@ class Agent:
         full_prompt = (
         f"{system_instruction}\n\n"
         f"User input: {prompt}\n\n"
-        f"Available functions:\n{json.dumps(self.function_descriptions, indent=2)}"
+        f"Available functions:\n{self.tools.intent_catalog}"
         )
+        return full_prompt
+        
+
+    def get_intent_and_inputs(self, prompt: str) -> str:
+        """
+        Determine the function to call and its inputs in a single model call.
+        """
+        full_prompt = self.intent_and_inputs_prompt(prompt)
         try:
-            response = llm.invoke(full_prompt)
-            print(f"[DEBUG] Response from LLM: {response.content}")
-            return response.content.strip()  # Assuming the response is a JSON string
+            response = llm.invoke(full_prompt, stage="combined")
+            self._count_tokens("combined", full_prompt, response)
+            self._log("Intent and inputs answer", response.content)
+            return response.content.strip()
         except Exception as e:
-            print(f"[ERROR] Error determining intent: {e}")
-            return {"error": str(e)}
-        
+            self._warn("Intent and inputs call failed", e)
+            return json.dumps({"error": str(e)})
+
+    def intent_and_inputs_prompt(self, prompt: str) -> str:
+        """
+        Build the prompt that asks for the function name and its inputs at once.
+        """
+        system_instruction = (
+            "You are an AI assistant that routes user queries to backend functions and extracts their inputs. "
+            "Pick the correct function from the available functions and fill in its inputs from the user's message. "
+            "Do not mix up user_id with any other *_id. If the function takes no inputs, use an empty object. "
+            "Respond only with a JSON like: "
+            "{\"function\": \"function_name\", \"inputs\": {\"input_name\": \"value\"}}."
+        )
+        full_prompt = (
+            f"{system_instruction}\n\n"
+            f"{self._memory_block()}"
+            f"The user_id {self.user_id} said: \"{prompt}\"\n\n"
+            f"Available functions and their inputs:\n{self.tools.combined_catalog}"
+        )
+        return full_prompt
 
     def get_function_inputs(self, prompt: str, function_name: str) -> dict:
-        input_schema = json.dumps(self.function_inputs[function_name], indent=2)
+        input_prompt = self.function_inputs_prompt(prompt, function_name)
+        self._log("Inputs prompt", input_prompt)
+        try:
+            response = llm.invoke(input_prompt, stage="inputs")
+            self._count_tokens("inputs", input_prompt, response)
+            self._log("Inputs answer", response.content)
+            
+            return response.content.strip()  # Assuming the response is a JSON string
+        except Exception as e:
+            return {"error": f"Input extraction failed: {str(e)}"}
+
+    def function_inputs_prompt(self, prompt: str, function_name: str) -> str:
+        """
+        Build the prompt that asks the model for the inputs of a known function.
+        """
+        input_schema = self.tools.input_docs_json[function_name]
         system_instruction = (
             "You are an AI assistant that extracts structured input data from user messages. "
             "Use the schema provided and return a valid JSON dictionary only. Do not explain. "
@@ -164,6 +600,7 @@ class Agent:
         )
         input_prompt = (
             f"{system_instruction}\n\n"
+            f"{self._memory_block()}"
             f"The user_id {self.user_id} said: \"{prompt}\"\n\n"
             f"The function to call is: {function_name}\n"
             f"The function expects the following inputs:\n{input_schema}\n\n"
@@ -172,15 +609,7 @@ class Agent:
             f"✅ If the function does require inputs, output them in a valid flat JSON object format (no explanation, no comments).\n\n"
             f"Now generate the input arguments in JSON format."
         )
-
-        print("[DEBUG] Generating function inputs with prompt:", input_prompt)
-        try:
-            response = llm.invoke(input_prompt)
-            print("[DEBUG] got inputs: ", response.content)
-            
-            return response.content.strip()  # Assuming the response is a JSON string
-        except Exception as e:
-            return {"error": f"Input extraction failed: {str(e)}"}
+        return input_prompt
 
 
 
@@ -188,28 +617,16 @@ class Agent:
         """
         Validate the inputs against the expected schema for the given function.
         """
-        schema = self.function_schemas.get(function_name.strip())
-        print(f"[DEBUG] Validating inputs for function '{function_name}': {inputs}")
-        print(f"[DEBUG] Using schema: {schema}")
-        # If no schema is found for the function, return False
-        if not schema:
-            return False
-        
-        try:
-            schema(**inputs)  # This will raise an error if inputs are invalid
-            return True
-        except Exception as e:
-            print(f"[ERROR] Input validation failed for {function_name}: {e}")
-            return False
+        return self.tools.validate(function_name.strip(), inputs)
         
 
     def execute_function(self, function_name: str, inputs: dict) -> dict:
         """
         Execute a registered function using unpacked keyword arguments.
         """
-        print(f"[DEBUG] Executing function '{function_name}' with inputs: {inputs}")
+        self._log("Executing function", inputs)
         
-        func = self.function_registry.get(function_name)
+        func = self.tools.functions.get(function_name)
         if not func:
             return {"error": f"Function '{function_name}' not found."}
 
@@ -223,25 +640,183 @@ class Agent:
         """
         Format the final AI output including function name, inputs, and response.
         """
+        prompt = self.final_ai_prompt(function_name, inputs, initial_prompt, function_result, error)
+        try:
+            response = llm.invoke(prompt, stage="final")
+            self._count_tokens("final", prompt, response)
+            return response.content.strip()
+        except Exception as e:
+            return str(e)
+
+    def final_ai_output_stream(self, function_name: str, inputs: dict, initial_prompt: str, function_result: dict, error: str):
+        """
+        Same as final_ai_output, but yields the reply as the model generates it.
+        """
+        prompt = self.final_ai_prompt(function_name, inputs, initial_prompt, function_result, error)
+        chunks = []
+        try:
+            for chunk in llm.stream(prompt, stage="final"):
+                if chunk.content:
+                    chunks.append(chunk.content)
+                    yield chunk.content
+        except Exception as e:
+            yield str(e)
+        finally:
+            self._count_tokens("final", prompt, "".join(chunks))
+
+    def final_ai_prompt(self, function_name: str, inputs: dict, initial_prompt: str, function_result: dict, error: str) -> str:
+        """
+        Build the prompt for the final natural-language reply.
+        """
         system_instruction = (
             "You are a helpful AI assistant. Based on the user's request, the system has determined the function to execute, "
             "its inputs, and the output from the backend. Now, write a natural, human-friendly message summarizing the result. "
             "If there was an error, politely explain it and suggest a rephrase, but only based on what the user said, do not mention the actual error "
         )
 
+        result, self.compaction = self.compactor.compact(function_name, function_result)
+        self._log("Function result compacted", self.compaction)
+
         prompt = f"{system_instruction}\n\n"
+        prompt += self._memory_block()
         prompt += f"User said: \"{initial_prompt}\"\n\n"
         prompt += f"Function to call: {function_name}\n"
-        prompt += f"Inputs: {json.dumps(inputs, indent=2)}\n\n"
-        prompt += f"Function result: {json.dumps(function_result, indent=2)}\n\n"
+        prompt += f"Inputs: {encode(inputs)}\n\n"
+        prompt += f"Function result: {result}\n\n"
         
         if error:
             prompt += f"Error: {error}\n\n"
 
         prompt += "Now generate a final response for the user, in natural language."
+        return prompt
+
 
+class AsyncAgent(Agent):
+    """
+    Agent for the ASGI chat view: awaits ``llm.ainvoke`` and async registry
+    functions, so a turn waiting on the model does not hold a worker thread.
+    Functions without an async variant run through ``sync_to_async``.
+    """
+    # Coroutines share the event loop thread's connection wrappers and the
+    # async ORM queries on another thread, so per-stage counts would be wrong.
+    count_queries = False
+
+    async def arun(self) -> str:
+        """
+        Async counterpart of run().
+        """
+        self._log("Received request", self.full_prompt)
+        if self.memory is not None:
+            with self.timed("memory"):
+                self.memory_context = await sync_to_async(self.memory.load, thread_sensitive=False)(self.full_prompt)
+
+        if not await self._aresolve_function():
+            return await self._aresponse()
+
+        if not await self._aexecute_function():
+            return await self._aresponse()
+
+        return await self._aresponse()
+
+    async def _aresolve_function(self) -> bool:
+        if self._route_intent():
+            if self._check_routed_inputs():
+                return True
+            self.router.record_fallback(self.function_name)
+            if not await self._aextract_inputs():
+                return False
+            return self._validate_inputs()
+
+        cached = self._use_cached_intent()
+        if self.mode == COMBINED_MODE and not cached:
+            with self.timed("combined"):
+                result = await self._ainvoke(self.intent_and_inputs_prompt(self.full_prompt), "combined")
+            if self._apply_intent_and_inputs(result) and self._validate_inputs():
+                self._store_intent()
+                self._store_inputs()
+                return True
+            self._log("Combined extraction failed, falling back", self.error)
+            self.function_name = ""
+            self.inputs = {}
+            self.error = ""
+
+        if not cached:
+            with self.timed("intent"):
+                result = await self._ainvoke(self.intent_prompt(self.full_prompt), "intent")
+            if not self._apply_intent(result):
+                return False
+            self._store_intent()
+
+        if not await self._aextract_inputs():
+            return False
+
+        if not self._validate_inputs():
+            return False
+        self._store_inputs()
+        return True
+
+    async def _aextract_inputs(self) -> bool:
+        if self._use_cached_inputs():
+            return True
+
+        with self.timed("inputs"):
+            result = await self._ainvoke(self.function_inputs_prompt(self.full_prompt, self.function_name), "inputs")
+        return self._apply_inputs(result)
+
+    async def _aexecute_function(self) -> bool:
+        try:
+            with self.timed("execute"):
+                self.function_result = await self.aexecute_function(self.function_name, self.inputs)
+            self._log("Function result", self.function_result)
+            return True
+        except Exception as e:
+            self.error = f"Error executing function: {e}"
+            return False
+
+    async def _aresponse(self) -> str:
+        self._log_response_data()
+        response = self._template_reply()
+        if response is not None:
+            return response
+
+        prompt = self.final_ai_prompt(
+            self.function_name,
+            self.inputs,
+            self.initial_prompt,
+            self.function_result,
+            self.error
+        )
+        with self.timed("final"):
+            try:
+                response = await llm.ainvoke(prompt, stage="final")
+                self._count_tokens("final", prompt, response)
+                response = response.content.strip()
+            except Exception as e:
+                response = str(e)
+        self._finish()
+        return response
+
+    async def _ainvoke(self, prompt: str, stage: str) -> str:
+        """
+        Await the model, turning failures into a JSON error the parsers reject.
+        """
         try:
-            response = llm.invoke(prompt)
+            response = await llm.ainvoke(prompt, stage=stage)
+            self._count_tokens(stage, prompt, response)
             return response.content.strip()
         except Exception as e:
-            return str(e)
+            self._warn(f"LLM call failed at stage {stage}", e)
+            return json.dumps({"error": str(e)})
+
+    async def aexecute_function(self, function_name: str, inputs: dict) -> dict:
+        """
+        Await the async variant of a registered function, or run the sync one in a thread.
+        """
+        func = self.tools.async_functions.get(function_name)
+        if func is None:
+            return await sync_to_async(self.execute_function)(function_name, inputs)
+
+        try:
+            return await func(**inputs)
+        except TypeError as e:
+            return {"error": f"Invalid arguments for function '{function_name}': {str(e)}"}
@@ -0,0 +1,7 @@
+from django.dispatch import Signal
+
+
+# Sent once per chat turn, after the reply is ready, with the Agent as
+# ``agent``. Receivers read ``agent.timings`` (milliseconds per stage),
+# ``agent.function_name``, ``agent.mode`` and ``agent.error``.
+agent_finished = Signal()
@@ -0,0 +1,44 @@
+import json
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets clients negotiate ``Accept: text/event-stream`` on the chat view.
+
+    Streams bypass renderers entirely, so this only ever renders the error
+    responses returned before a stream starts.
+    """
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return sse_event("error", data).encode(self.charset)
+
+
+def sse_event(event: str, data) -> str:
+    """
+    Encode one Server-Sent Event with a JSON payload.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def wants_event_stream(request) -> bool:
+    """
+    Streaming is opt-in, via ``?stream=true`` or ``Accept: text/event-stream``.
+    """
+    if request.query_params.get('stream', '').lower() in ('1', 'true', 'yes'):
+        return True
+    return 'text/event-stream' in request.META.get('HTTP_ACCEPT', '')
+
+
+def event_stream_response(events) -> StreamingHttpResponse:
+    """
+    Wrap an iterator of encoded events in an unbuffered streaming response.
+    """
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
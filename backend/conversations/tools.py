@@ -0,0 +1,176 @@
+import inspect
+import json
+from functools import cached_property
+from typing import Any, Callable, Dict, Iterable, Optional, Type
+from pydantic import BaseModel, ValidationError, create_model
+from .cache import catalog_hash
+
+
+class Tool:
+    """
+    One agent function: the callable, its input model and what the model
+    and the router are told about it.
+    """
+
+    def __init__(self, name: str, func: Callable[..., Any], schema: Type[BaseModel],
+                 description: str, routes: Iterable[str] = ()):
+        self.name = name
+        self.func = func
+        self.schema = schema
+        self.description = description
+        self.routes = list(routes)
+        self.async_func: Optional[Callable[..., Any]] = None
+
+    @property
+    def input_docs(self) -> Optional[Dict[str, str]]:
+        """
+        Input name -> description shown to the model, None for no inputs.
+        """
+        if not self.schema.model_fields:
+            return None
+        return {
+            name: field.description or f"a {getattr(field.annotation, '__name__', 'value')} value"
+            for name, field in self.schema.model_fields.items()
+        }
+
+
+class ToolRegistry:
+    """
+    Agent functions declared with ``@tools.tool(...)``.
+
+    The input model is either given or built from the signature, and every
+    field must be a parameter of the function, so the documented inputs,
+    the validator and the call can no longer drift apart. The descriptions,
+    input docs, schemas and registries the agent consumes are derived from
+    the tools, and the JSON prompt fragments and the catalog hash are
+    computed once after the last registration: ``compile()``, called from
+    the app's ``ready()``, builds them at startup, and a later registration
+    drops them to be rebuilt on next use.
+    """
+    _derived = ("descriptions", "inputs", "schemas", "functions", "async_functions",
+                "intent_catalog", "combined_catalog", "input_docs_json", "catalog_hash")
+
+    def __init__(self):
+        self.tools: Dict[str, Tool] = {}
+
+    def tool(self, schema: Optional[Type[BaseModel]] = None, description: Optional[str] = None,
+             routes: Iterable[str] = (), name: Optional[str] = None):
+        """
+        Register the decorated function. ``description`` defaults to the
+        first paragraph of its docstring; ``routes`` are IntentRouter rules.
+        """
+        def register(func):
+            tool_name = name or func.__name__
+            tool_schema = schema or _schema_from_signature(tool_name, func)
+            _check_schema(tool_name, func, tool_schema)
+            text = description or inspect.cleandoc(func.__doc__ or "").split("\n\n")[0]
+            if not text:
+                raise TypeError(f"Tool '{tool_name}' needs a description or a docstring")
+            self.tools[tool_name] = Tool(tool_name, func, tool_schema, text, routes)
+            self._reset()
+            return func
+        return register
+
+    def async_variant(self, name: str):
+        """
+        Register the decorated coroutine as the ASGI implementation of ``name``.
+        """
+        def register(func):
+            if name not in self.tools:
+                raise KeyError(f"Register tool '{name}' before its async variant")
+            _check_schema(name, func, self.tools[name].schema)
+            self.tools[name].async_func = func
+            self._reset()
+            return func
+        return register
+
+    def compile(self) -> "ToolRegistry":
+        """
+        Build every derived view and prompt fragment now, so no request pays for it.
+        """
+        for attribute in self._derived:
+            getattr(self, attribute)
+        return self
+
+    def _reset(self):
+        for attribute in self._derived:
+            self.__dict__.pop(attribute, None)
+
+    # The dicts the agent, the router and the cache are built around.
+
+    @cached_property
+    def descriptions(self) -> Dict[str, dict]:
+        return {
+            name: {"description": tool.description, **({"routes": tool.routes} if tool.routes else {})}
+            for name, tool in self.tools.items()
+        }
+
+    @cached_property
+    def inputs(self) -> Dict[str, Optional[Dict[str, str]]]:
+        return {name: tool.input_docs for name, tool in self.tools.items()}
+
+    @cached_property
+    def schemas(self) -> Dict[str, Type[BaseModel]]:
+        return {name: tool.schema for name, tool in self.tools.items()}
+
+    @cached_property
+    def functions(self) -> Dict[str, Callable[..., Any]]:
+        return {name: tool.func for name, tool in self.tools.items()}
+
+    @cached_property
+    def async_functions(self) -> Dict[str, Callable[..., Any]]:
+        return {name: tool.async_func for name, tool in self.tools.items() if tool.async_func}
+
+    # Precompiled prompt fragments.
+
+    @cached_property
+    def intent_catalog(self) -> str:
+        return json.dumps({name: {"description": tool.description} for name, tool in self.tools.items()}, indent=2)
+
+    @cached_property
+    def combined_catalog(self) -> str:
+        return json.dumps(
+            {name: {"description": tool.description, "inputs": tool.input_docs or {}} for name, tool in self.tools.items()},
+            indent=2,
+        )
+
+    @cached_property
+    def input_docs_json(self) -> Dict[str, str]:
+        return {name: json.dumps(tool.input_docs, indent=2) for name, tool in self.tools.items()}
+
+    @cached_property
+    def catalog_hash(self) -> str:
+        return catalog_hash(self.descriptions, self.inputs, self.schemas)
+
+    def validate(self, name: str, inputs: dict) -> bool:
+        tool = self.tools.get(name)
+        if tool is None or not isinstance(inputs, dict):
+            return False
+        try:
+            tool.schema.model_validate(inputs)
+            return True
+        except ValidationError:
+            return False
+
+
+def _schema_from_signature(name: str, func: Callable[..., Any]) -> Type[BaseModel]:
+    fields = {}
+    for parameter in inspect.signature(func).parameters.values():
+        annotation = parameter.annotation if parameter.annotation is not inspect.Parameter.empty else Any
+        default = parameter.default if parameter.default is not inspect.Parameter.empty else ...
+        fields[parameter.name] = (annotation, default)
+    model_name = "".join(part.capitalize() for part in name.split("_")) + "Input"
+    return create_model(model_name, **fields)
+
+
+def _check_schema(name: str, func: Callable[..., Any], schema: Type[BaseModel]):
+    parameters = inspect.signature(func).parameters
+    unknown = [field for field in schema.model_fields if field not in parameters]
+    if unknown:
+        raise TypeError(f"Tool '{name}': schema fields {unknown} are not parameters of {func.__name__}()")
+    missing = [
+        parameter.name for parameter in parameters.values()
+        if parameter.default is inspect.Parameter.empty and parameter.name not in schema.model_fields
+    ]
+    if missing:
+        raise TypeError(f"Tool '{name}': required parameters {missing} are missing from the schema")
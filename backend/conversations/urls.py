@@ -5,5 +5,10 @@ urlpatterns = [
     path('', views.conversation_list),
     path('<int:pk>/', views.conversation_detail),
     path('chat/', views.chat),
+    path('chat/async/', views.chat_async),
+    path('chat/jobs/<uuid:job_id>/', views.chat_job),
     path('user/<int:user_id>/', views.get_conversation_by_user),
+    path('router-stats/', views.router_stats),
+    path('cache-stats/', views.cache_stats),
+    path('metrics/', views.metrics_view),
 ]
@@ -1,20 +1,48 @@
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
-from .models import Conversation
+from .models import ChatJob, Conversation
 from users.models import User
-from .serializers import ConversationSerializer
-from drf_spectacular.utils import extend_schema
+from .serializers import ChatJobSerializer, ConversationSerializer
+from drf_spectacular.utils import extend_schema, OpenApiParameter
+from AIshop.pagination import paginate
 import json
-from .services import Agent
-from .functions import function_descriptions, function_inputs, function_schemas, function_registry
+import logging
+import time
+from .services import Agent, AsyncAgent
+from .functions import intent_router, tools
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.decorators import permission_classes
+from rest_framework.decorators import permission_classes, renderer_classes
+from rest_framework.settings import api_settings
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from .cache import agent_cache
+from .persistence import conversation_writer
+from .archive import archived_history
+from .history import DEFAULT_LIMIT, MAX_LIMIT, history_page
+from .jobs import enqueue, wants_job
+from .admission import AdmissionRejected, AdmittedStream, admission
+from .memory import ConversationMemory
+from . import metrics
+from django.http import HttpResponse
+from django.conf import settings
+from .replies import reply_templates
+from .streaming import EventStreamRenderer, event_stream_response, sse_event, wants_event_stream
+from . import log
+
+
+logger = logging.getLogger("conversations.views")
 
 
 @extend_schema(
     summary="List or create conversations",
-    description="GET lists all messages. POST adds a new message.",
+    description="GET lists messages newest first, one cursor page at a time. POST adds a new message.",
+    parameters=[
+        OpenApiParameter("cursor", str, description="Opaque cursor from a previous page's next/previous link."),
+        OpenApiParameter("page_size", int, description="Items per page (default 50, max 500)."),
+    ],
     request=ConversationSerializer,
     responses=ConversationSerializer,
     tags=["Conversations"]
@@ -22,9 +50,7 @@ from rest_framework.decorators import permission_classes
 @api_view(['GET'])
 def conversation_list(request):
     if request.method == 'GET':
-        conversations = Conversation.objects.all()
-        serializer = ConversationSerializer(conversations, many=True)
-        return Response(serializer.data)
+        return paginate(request, Conversation.objects.all(), ConversationSerializer)
 
 
 
@@ -58,7 +84,11 @@ def conversation_detail(request, pk):
     
 @extend_schema(
     summary="Chat with the AI agent",
-    description="Chat with the AI agent by sending a user ID and message. The agent will respond based on the provided user ID.",
+    description="Chat with the AI agent by sending a user ID and message. The agent will respond based on the provided user ID. "
+                "Send ?stream=true or Accept: text/event-stream to receive intent, function and token events as Server-Sent Events. "
+                "Send ?job=true or Prefer: respond-async to queue the turn for a background worker instead: the response is "
+                "202 with the job, whose Location can be polled or streamed for the reply. "
+                "Refused turns (per-user rate limit, or the assistant is at capacity) get 429 with a Retry-After header.",
     request=ConversationSerializer,
     responses=ConversationSerializer,
     tags=["Conversations"]
@@ -68,48 +98,284 @@ def conversation_detail(request, pk):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
-
+@renderer_classes(api_settings.DEFAULT_RENDERER_CLASSES + [EventStreamRenderer])
 def chat(request):
-    
-    print(f"[CHAT] Received request: {request.data}", flush=True)
     user_id = str(request.user.id)  # get from authenticated user
-    print("[CHAT] recieved user with id: ", user_id, flush=True)
     message = request.data.get("message")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Chat request", extra={"user_id": user_id, **log.payload(request.data)})
 
     if not user_id or not message:
         return Response({"error": "user_id and message are required"}, status=status.HTTP_400_BAD_REQUEST)
 
-    # Save user message
-    Conversation.objects.create(user_id=user_id, message=message, direction="user")
+    # Refused turns are answered before anything is saved or sent to the model.
+    # Queued jobs only spend a rate token; the worker pool bounds their concurrency.
+    try:
+        if admission is not None:
+            if wants_job(request):
+                admission.check_rate(user_id)
+            else:
+                admission.acquire(user_id)
+    except AdmissionRejected as e:
+        return Response(_rejection(e), status=status.HTTP_429_TOO_MANY_REQUESTS, headers={"Retry-After": str(e.retry_after)})
 
-    # Handle chat logic
-    agent = Agent(user_id, message, function_descriptions=function_descriptions,function_schemas=function_schemas, function_inputs=function_inputs, function_registry=function_registry)
-    response = agent.run()
+    if wants_job(request):
+        conversation_writer.save(user_id, message, "user")
+        job = enqueue(user_id, message, _rich_reply(request.data))
+        return Response(ChatJobSerializer(job).data, status=status.HTTP_202_ACCEPTED, headers={"Location": _job_url(job)})
 
-    
+    streaming = False
+    try:
+        agent = Agent(user_id, message, tools, router=intent_router, cache=agent_cache, reply_templates=reply_templates, rich_reply=_rich_reply(request.data), memory=ConversationMemory.from_settings(user_id))
+
+        # Save user message
+        with agent.timed("persist"):
+            conversation_writer.save(user_id, message, "user")
+
+        # Handle chat logic
+        if wants_event_stream(request):
+            events = _chat_events(agent, user_id)
+            if admission is not None:
+                events = AdmittedStream(events, admission)
+            streaming = True
+            return event_stream_response(events)
+
+        response = agent.run()
+    finally:
+        # A stream gives its slot back when the response is closed.
+        if admission is not None and not streaming:
+            admission.release()
 
     # Save AI response
-    Conversation.objects.create(user_id=user_id, message=response, direction="llm")
+    with agent.timed("persist"):
+        conversation_writer.save(user_id, response, "llm")
+
+    metrics.record_turn(agent)
+    return Response({"message": response}, status=status.HTTP_200_OK, headers={"Server-Timing": metrics.server_timing(agent.timings)})
+
+
+async def chat_async(request):
+    """
+    Async chat endpoint for ASGI deployments.
+
+    Same contract as ``chat`` but runs the AsyncAgent, so the worker only
+    awaits the model instead of blocking a thread on it. Plain Django view
+    because DRF's api_view is sync-only; JWT auth is applied by hand.
+    """
+    if request.method != 'POST':
+        return JsonResponse({"detail": f'Method "{request.method}" not allowed.'}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    try:
+        auth = await sync_to_async(JWTAuthentication().authenticate)(request)
+    except AuthenticationFailed as e:
+        return JsonResponse({"detail": str(e.detail)}, status=status.HTTP_401_UNAUTHORIZED)
+    if auth is None:
+        return JsonResponse({"detail": "Authentication credentials were not provided."}, status=status.HTTP_401_UNAUTHORIZED)
+
+    try:
+        data = json.loads(request.body or b"{}")
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Request body must be JSON"}, status=status.HTTP_400_BAD_REQUEST)
+
+    user_id = str(auth[0].id)
+    message = data.get("message")
+    if not message:
+        return JsonResponse({"error": "user_id and message are required"}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        if admission is not None:
+            if wants_job(request):
+                admission.check_rate(user_id)
+            else:
+                await admission.aacquire(user_id)
+    except AdmissionRejected as e:
+        return JsonResponse(_rejection(e), status=status.HTTP_429_TOO_MANY_REQUESTS, headers={"Retry-After": str(e.retry_after)})
+
+    if wants_job(request):
+        await conversation_writer.asave(user_id, message, "user")
+        job = await sync_to_async(enqueue)(user_id, message, _rich_reply(data))
+        return JsonResponse(ChatJobSerializer(job).data, status=status.HTTP_202_ACCEPTED, headers={"Location": _job_url(job)})
+
+    try:
+        agent = AsyncAgent(user_id, message, tools, router=intent_router, cache=agent_cache, reply_templates=reply_templates, rich_reply=_rich_reply(data), memory=ConversationMemory.from_settings(user_id))
+
+        with agent.timed("persist"):
+            await conversation_writer.asave(user_id, message, "user")
+
+        response = await agent.arun()
+    finally:
+        if admission is not None:
+            admission.release()
+
+    with agent.timed("persist"):
+        await conversation_writer.asave(user_id, response, "llm")
+
+    metrics.record_turn(agent)
+    return JsonResponse({"message": response}, status=status.HTTP_200_OK, headers={"Server-Timing": metrics.server_timing(agent.timings)})
+
+
+# Token-authenticated, no session cookie to protect.
+chat_async.csrf_exempt = True
+
+
+def _rich_reply(data):
+    """
+    "rich": true asks for a model-written reply even when a template exists.
+    """
+    rich = data.get("rich")
+    if rich is None:
+        return None
+    return str(rich).lower() in ("1", "true", "yes")
+
+
+def _rejection(error: AdmissionRejected) -> dict:
+    if error.reason == "rate_limited":
+        detail = "Too many chat messages, slow down."
+    else:
+        detail = "The assistant is busy, try again shortly."
+    return {"error": detail, "reason": error.reason, "retry_after": error.retry_after}
+
 
-    return Response({"message": response}, status=status.HTTP_200_OK)
+def _job_url(job):
+    return f"/api/conversations/chat/jobs/{job.id}/"
 
 
+def _chat_events(agent, user_id):
+    """
+    Relay the agent's stage events and save the reply once it is complete.
+    Headers are gone by then, so streamed turns report timings only to
+    the metrics endpoint and the log.
+    """
+    for event, data in agent.run_stream():
+        if event == "done":
+            with agent.timed("persist"):
+                conversation_writer.save(user_id, data["message"], "llm")
+            metrics.record_turn(agent)
+        yield sse_event(event, data)
+
+
+
+@extend_schema(
+    summary="Get a queued chat turn",
+    description="Returns the job's status and, once done, the reply. Send ?stream=true or Accept: text/event-stream "
+                "to receive a \"status\" event on every change and a final \"done\" (with the message) or \"error\" event.",
+    responses=ChatJobSerializer,
+    tags=["Conversations"]
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@renderer_classes(api_settings.DEFAULT_RENDERER_CLASSES + [EventStreamRenderer])
+def chat_job(request, job_id):
+    try:
+        job = ChatJob.objects.get(pk=job_id, user=request.user)
+    except ChatJob.DoesNotExist:
+        return Response({'error': 'Not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    if wants_event_stream(request):
+        return event_stream_response(_job_events(job))
+    return Response(ChatJobSerializer(job).data, status=status.HTTP_200_OK)
+
+
+def _job_events(job):
+    """
+    Poll the job until it finishes or the stream times out.
+    """
+    deadline = time.monotonic() + settings.CHAT_JOBS_STREAM_TIMEOUT
+    last = None
+    while True:
+        if job.status != last:
+            last = job.status
+            yield sse_event("status", {"status": job.status, "attempts": job.attempts})
+        if job.status == ChatJob.DONE:
+            yield sse_event("done", {"message": job.reply})
+            return
+        if job.status == ChatJob.FAILED:
+            yield sse_event("error", {"error": job.error})
+            return
+        if time.monotonic() >= deadline:
+            yield sse_event("timeout", {"status": job.status})
+            return
+        time.sleep(settings.CHAT_JOBS_POLL_INTERVAL)
+        job.refresh_from_db(fields=["status", "attempts", "reply", "error"])
+
 
 @extend_schema(
-    summary="Get all conversations for a specific user",
-    description="Retrieve all conversation messages associated with a given user ID.",
-    request =ConversationSerializer,
+    summary="Get the conversation history of a user",
+    description=(
+        "Without parameters, returns every message of the user, archived ones included, oldest first. With `limit` or `before`, "
+        "returns one page of lightweight messages newest first as `{results, next}`. Pass `next` back as "
+        "`before` to get the page of older messages."
+    ),
+    parameters=[
+        OpenApiParameter("limit", int, description=f"Messages per page (default {DEFAULT_LIMIT}, max {MAX_LIMIT})."),
+        OpenApiParameter("before", str, description="Cursor from a previous page's `next`."),
+    ],
     responses={200: ConversationSerializer(many=True)},
     tags=["Conversations"]
 )
 @api_view(['GET'])
 def get_conversation_by_user(request, user_id):
+    if 'limit' in request.query_params or 'before' in request.query_params:
+        return _conversation_history_page(request, user_id)
+
     try:
         user = User.objects.get(id=user_id)
     except User.DoesNotExist:
         return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
 
-    conversations = Conversation.objects.filter(user=user)
+    archived = [dict(row, user=user) for row in archived_history(user.id)]
+    conversations = Conversation.objects.filter(user=user).order_by('timestamp', 'id')
     serializer = ConversationSerializer(conversations, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    return Response(ConversationSerializer(archived, many=True).data + serializer.data, status=status.HTTP_200_OK)
+
+
+def _conversation_history_page(request, user_id):
+    try:
+        limit = min(int(request.query_params.get('limit', DEFAULT_LIMIT)), MAX_LIMIT)
+    except ValueError:
+        return Response({'error': 'limit must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+    if limit < 1:
+        return Response({'error': 'limit must be at least 1.'}, status=status.HTTP_400_BAD_REQUEST)
+    if not User.objects.filter(id=user_id).exists():
+        return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        results, next_cursor = history_page(user_id, limit, request.query_params.get('before'))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'results': results, 'next': next_cursor}, status=status.HTTP_200_OK)
+
+
+
+@extend_schema(
+    summary="Intent router hit-rate counters",
+    description="Returns how many chat messages the rule-based intent router answered without a model call, per function.",
+    tags=["Conversations"]
+)
+@api_view(['GET'])
+def router_stats(request):
+    return Response(intent_router.snapshot(), status=status.HTTP_200_OK)
+
+
+@extend_schema(
+    summary="Intent and input cache counters",
+    description="Returns hit, miss, eviction and expiration counts for the chat agent's intent and input caches.",
+    tags=["Conversations"]
+)
+@api_view(['GET'])
+def cache_stats(request):
+    if agent_cache is None:
+        return Response({"enabled": False}, status=status.HTTP_200_OK)
+    return Response({"enabled": True, **agent_cache.snapshot()}, status=status.HTTP_200_OK)
+
 
+def metrics_view(request):
+    """
+    Chat pipeline metrics in the Prometheus text format, for this process.
+    """
+    collectors = [lambda: metrics.router_block(intent_router.snapshot())]
+    if agent_cache is not None:
+        collectors.append(lambda: metrics.cache_block(agent_cache.snapshot()))
+    if admission is not None:
+        collectors.append(lambda: metrics.admission_block(admission.snapshot()))
+    return HttpResponse(metrics.expose(collectors), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,7 @@
+from AIshop.transfer import ExportCommand
+from orders.transfer import export_orders
+
+
+class Command(ExportCommand):
+    help = "Stream all orders to a CSV or JSONL file (or stdout) without loading them into memory."
+    export_rows = export_orders
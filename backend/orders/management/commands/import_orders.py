@@ -0,0 +1,7 @@
+from AIshop.transfer import ImportCommand
+from orders.transfer import import_orders
+
+
+class Command(ImportCommand):
+    help = "Upsert orders from a CSV or JSONL file by their external key, in chunked transactions."
+    import_rows = import_orders
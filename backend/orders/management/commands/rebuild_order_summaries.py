@@ -0,0 +1,30 @@
+import time
+from django.core.management.base import BaseCommand
+from orders.models import Order, OrderSummary
+from orders.summaries import rebuild_summaries
+
+
+class Command(BaseCommand):
+    help = "Rebuild the OrderSummary read model from the orders table (backfill or repair)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, help="Only rebuild this user's summaries.")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Orders upserted per query.")
+        parser.add_argument("--clear", action="store_true", help="Delete existing summaries in scope first.")
+
+    def handle(self, *args, **options):
+        orders = Order.objects.all()
+        summaries = OrderSummary.objects.all()
+        if options["user"] is not None:
+            orders = orders.filter(user_id=options["user"])
+            summaries = summaries.filter(user_id=options["user"])
+
+        if options["clear"]:
+            deleted, _ = summaries.delete()
+            self.stdout.write(f"Deleted {deleted} summaries.")
+
+        start = time.perf_counter()
+        total = rebuild_summaries(orders, batch_size=options["batch_size"])
+        elapsed = time.perf_counter() - start
+        rate = total / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {total} order summaries in {elapsed:.2f}s ({rate:.0f} rows/s)."))
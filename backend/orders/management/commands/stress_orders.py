@@ -0,0 +1,85 @@
+import threading
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from rest_framework.exceptions import ValidationError
+from orders.models import Order
+from orders.serializers import OrderSerializer
+from products.models import Product
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Hammer one product with concurrent orders through OrderSerializer and check that stock "
+        "never goes negative and every unit sold is accounted for. Reports orders/sec."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=16, help="Concurrent buyers.")
+        parser.add_argument("--attempts", type=int, default=500, help="Total order attempts across all threads.")
+        parser.add_argument("--stock", type=int, default=200, help="Starting stock of the contested product.")
+        parser.add_argument("--quantity", type=int, default=1, help="Units per order.")
+        parser.add_argument("--keep", action="store_true", help="Keep the stress product and its orders afterwards.")
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(email="stress@bench.local").first()
+        if user is None:
+            user = User.objects.create_user("stress@bench.local", "stress", password="stress-password")
+        product = Product.objects.create(name="Stress product", price=1, quantity=options["stock"])
+
+        attempts = iter(range(options["attempts"]))
+        attempts_lock = threading.Lock()
+        counts = {"placed": 0, "rejected": 0, "errors": 0}
+        counts_lock = threading.Lock()
+
+        def worker():
+            try:
+                while True:
+                    with attempts_lock:
+                        if next(attempts, None) is None:
+                            return
+                    serializer = OrderSerializer(data={"user": user.id, "product": product.id, "quantity": options["quantity"]})
+                    try:
+                        if not serializer.is_valid():
+                            outcome = "rejected"
+                        else:
+                            serializer.save()
+                            outcome = "placed"
+                    except ValidationError:
+                        outcome = "rejected"
+                    except Exception as e:
+                        self.stderr.write(f"order failed: {e}")
+                        outcome = "errors"
+                    with counts_lock:
+                        counts[outcome] += 1
+            finally:
+                close_old_connections()
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker) for _ in range(options["threads"])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - started
+
+        product.refresh_from_db()
+        orders = Order.objects.filter(product=product)
+        sold = sum(orders.values_list("quantity", flat=True))
+        self.stdout.write(
+            f"{options['attempts']} attempts by {options['threads']} threads in {wall:.2f}s: "
+            f"{counts['placed']} placed, {counts['rejected']} rejected, {counts['errors']} errors"
+        )
+        self.stdout.write(f"{counts['placed'] / wall:.1f} orders/s; stock {options['stock']} -> {product.quantity}, sold {sold}")
+
+        consistent = (
+            product.quantity >= 0
+            and sold + product.quantity == options["stock"]
+            and orders.count() == counts["placed"]
+        )
+        if not options["keep"]:
+            product.delete()
+        if not consistent:
+            raise CommandError("Stock and orders disagree: the product was oversold or an order was lost.")
+        self.stdout.write(self.style.SUCCESS("No overselling."))
@@ -13,6 +13,39 @@ class Order(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField()
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    # Key of the order in an external system; imports upsert by it.
+    external_id = models.CharField(max_length=64, unique=True, null=True, blank=True)
 
     def __str__(self):
         return f"{self.user.name} - {self.product.name} ({self.status})"
+
+
+class OrderSummary(models.Model):
+    """
+    Denormalized read model of an order for "my orders" lookups: one row per
+    order carrying the product name, so listing a user's orders is a single
+    indexed query with no joins. Kept in sync by orders.signals.
+    """
+    order = models.OneToOneField(Order, on_delete=models.CASCADE, primary_key=True, related_name='summary')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    product_name = models.CharField(max_length=100)
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(max_length=10, choices=Order.STATUS_CHOICES)
+
+    class Meta:
+        indexes = [models.Index(fields=['user', 'order'], name='ordersummary_user_order_idx')]
+
+    @classmethod
+    def from_order(cls, order):
+        return cls(
+            order_id=order.id,
+            user_id=order.user_id,
+            product_id=order.product_id,
+            product_name=order.product.name,
+            quantity=order.quantity,
+            status=order.status,
+        )
+
+    def __str__(self):
+        return f"Order #{self.order_id}: {self.product_name} x{self.quantity} ({self.status})"
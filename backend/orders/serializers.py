@@ -1,5 +1,8 @@
+from django.db import transaction
 from rest_framework import serializers
+from users.models import User
 from .models import Order
+from .services import BULK_MODES, ATOMIC, reserve_stock
 from drf_spectacular.utils import extend_schema_serializer, OpenApiExample
 
 
@@ -34,13 +37,40 @@ class OrderSerializer(serializers.ModelSerializer):
 
         if quantity_requested > product.quantity:
             raise serializers.ValidationError(
-                f"Requested quantity ({quantity_requested}) exceeds available stock ({product.available_quantity})."
+                f"Requested quantity ({quantity_requested}) exceeds available stock ({product.quantity})."
             )
         return data
 
     def create(self, validated_data):
+        # validate() is only an early check on a possibly stale read; the
+        # conditional decrement is what actually guards the stock.
         product = validated_data['product']
-        product.quantity -= validated_data['quantity']
-        product.save()
+        quantity = validated_data['quantity']
+        with transaction.atomic():
+            if not reserve_stock(product.pk, quantity):
+                raise serializers.ValidationError(
+                    f"Requested quantity ({quantity}) exceeds available stock of {product.name}."
+                )
+            order = super().create(validated_data)
+        product.quantity -= quantity
+        return order
 
-        return super().create(validated_data)
+
+class BulkOrderLineSerializer(serializers.Serializer):
+    product = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
+
+
+class BulkOrderSerializer(serializers.Serializer):
+    user = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())
+    mode = serializers.ChoiceField(choices=BULK_MODES, default=ATOMIC)
+    lines = BulkOrderLineSerializer(many=True, allow_empty=False, max_length=1000)
+
+
+class BulkOrderResultSerializer(serializers.Serializer):
+    index = serializers.IntegerField()
+    product = serializers.IntegerField()
+    quantity = serializers.IntegerField()
+    status = serializers.ChoiceField(choices=["created", "rejected", "skipped"])
+    order = serializers.IntegerField(allow_null=True)
+    error = serializers.CharField(allow_null=True)
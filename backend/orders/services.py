@@ -0,0 +1,97 @@
+from typing import List
+from django.db import transaction
+from django.db.models import F
+from products.cache import catalog_cache
+from products.models import Product
+from .models import Order
+from .summaries import save_summaries
+
+
+ATOMIC = "atomic"
+PARTIAL = "partial"
+BULK_MODES = (ATOMIC, PARTIAL)
+
+
+def reserve_stock(product_id, quantity: int) -> bool:
+    """
+    Take ``quantity`` units of a product in one conditional UPDATE.
+
+    ``UPDATE ... SET quantity = quantity - n WHERE id = ? AND quantity >= n``
+    checks and decrements in a single statement, so concurrent buyers can
+    never oversell and only the row lock is held, never a read-then-write
+    window. Returns False (nothing changed) when stock is short. Call it
+    inside the transaction that creates the order, so a failed insert puts
+    the stock back.
+    """
+    reserved = Product.objects.filter(pk=product_id, quantity__gte=quantity).update(
+        quantity=F('quantity') - quantity
+    )
+    if reserved:
+        # update() skips post_save, so retire the cached catalog ourselves.
+        transaction.on_commit(lambda: catalog_cache.invalidate(product_id))
+    return bool(reserved)
+
+
+def place_orders(user_id, lines: List[dict], mode: str = ATOMIC) -> List[dict]:
+    """
+    Place many orders for one user in one transaction.
+
+    The products involved are locked with ``SELECT ... FOR UPDATE`` in
+    primary-key order, so two overlapping batches always lock in the same
+    order and cannot deadlock. Every line is then checked against the locked
+    stock in one pass, the stock rows are written back with one
+    ``bulk_update`` and the orders inserted with one ``bulk_create``.
+
+    In ``atomic`` mode a single bad line rejects the whole batch and nothing
+    is written. In ``partial`` mode the good lines are placed and the bad
+    ones reported. Returns one result per line, in input order.
+    """
+    if mode not in BULK_MODES:
+        raise ValueError(f"Unknown bulk order mode '{mode}'")
+
+    with transaction.atomic():
+        product_ids = sorted({line["product"] for line in lines})
+        products = {
+            product.pk: product
+            for product in Product.objects.select_for_update().filter(pk__in=product_ids).order_by("pk")
+        }
+        remaining = {pk: product.quantity for pk, product in products.items()}
+
+        results, orders = [], []
+        for index, line in enumerate(lines):
+            result = {"index": index, "product": line["product"], "quantity": line["quantity"], "order": None}
+            product = products.get(line["product"])
+            if product is None:
+                result.update(status="rejected", error="Product not found.")
+            elif line["quantity"] > remaining[product.pk]:
+                result.update(
+                    status="rejected",
+                    error=f"Requested quantity ({line['quantity']}) exceeds available stock ({remaining[product.pk]}).",
+                )
+            else:
+                remaining[product.pk] -= line["quantity"]
+                result.update(status="created", error=None)
+                orders.append((result, Order(user_id=user_id, product=product, quantity=line["quantity"])))
+            results.append(result)
+
+        if mode == ATOMIC and len(orders) < len(lines):
+            for result, _ in orders:
+                result["status"] = "skipped"
+            return results
+
+        changed = []
+        for pk, product in products.items():
+            if remaining[pk] != product.quantity:
+                product.quantity = remaining[pk]
+                changed.append(product)
+        Product.objects.bulk_update(changed, ["quantity"])
+
+        # bulk_create skips post_save, so the summaries are written here.
+        created = Order.objects.bulk_create([order for _, order in orders])
+        save_summaries(created)
+        for (result, _), order in zip(orders, created):
+            result["order"] = order.pk
+
+        changed_ids = [product.pk for product in changed]
+        transaction.on_commit(lambda: catalog_cache.invalidate_many(changed_ids))
+    return results
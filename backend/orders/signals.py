@@ -0,0 +1,27 @@
+from django.db.models import OuterRef, Subquery
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from products.models import Product
+from products.signals import products_bulk_changed
+from .models import Order, OrderSummary
+from .summaries import save_summaries
+
+
+@receiver(post_save, sender=Order)
+def sync_order_summary(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    save_summaries([instance])
+
+
+@receiver(post_save, sender=Product)
+def sync_product_name(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    OrderSummary.objects.filter(product=instance).exclude(product_name=instance.name).update(product_name=instance.name)
+
+
+@receiver(products_bulk_changed)
+def sync_product_names(sender, product_ids, **kwargs):
+    names = Product.objects.filter(pk=OuterRef('product_id')).values('name')[:1]
+    OrderSummary.objects.filter(product_id__in=product_ids).update(product_name=Subquery(names))
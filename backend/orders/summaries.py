@@ -0,0 +1,37 @@
+from .models import Order, OrderSummary
+
+
+SUMMARY_FIELDS = ['user', 'product', 'product_name', 'quantity', 'status']
+
+
+def save_summaries(orders):
+    """
+    Upsert the summaries of already-saved orders (``product`` loaded) in one query.
+    """
+    if not orders:
+        return
+    OrderSummary.objects.bulk_create(
+        [OrderSummary.from_order(order) for order in orders],
+        update_conflicts=True,
+        unique_fields=['order'],
+        update_fields=SUMMARY_FIELDS,
+    )
+
+
+def rebuild_summaries(queryset=None, batch_size=1000):
+    """
+    Upsert summaries for ``queryset`` (all orders by default) in batches,
+    streaming orders so memory stays flat. Returns the number of orders.
+    """
+    queryset = (queryset if queryset is not None else Order.objects.all()).select_related('product').order_by('id')
+    batch, total = [], 0
+    for order in queryset.iterator(chunk_size=batch_size):
+        batch.append(order)
+        if len(batch) >= batch_size:
+            save_summaries(batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        save_summaries(batch)
+        total += len(batch)
+    return total
@@ -0,0 +1,116 @@
+from typing import Iterable, Iterator
+from django.db import transaction
+from AIshop.transfer import ImportReport, chunked, write_rows
+from products.models import Product
+from users.models import User
+from .models import Order
+from .summaries import save_summaries
+
+
+EXPORT_FIELDS = ["id", "external_id", "user", "product", "product_sku", "quantity", "status"]
+EXPORT_COLUMNS = ["id", "external_id", "user_id", "product_id", "product__sku", "quantity", "status"]
+STATUSES = {value for value, _ in Order.STATUS_CHOICES}
+
+
+def export_orders(fmt: str, chunk_size: int = 2000) -> Iterator[str]:
+    """
+    Stream every order as CSV or JSONL text, ``chunk_size`` rows per query.
+    """
+    rows = Order.objects.order_by("id").values_list(*EXPORT_COLUMNS).iterator(chunk_size=chunk_size)
+    return write_rows(rows, EXPORT_FIELDS, fmt)
+
+
+def import_orders(rows: Iterable[dict], batch_size: int = 1000) -> ImportReport:
+    """
+    Upsert orders by ``external_id``, ``batch_size`` rows per transaction.
+
+    Rows name the product by ``product`` (id) or ``product_sku``. This is a
+    record sync, so product stock is not touched. The order summaries are
+    written in the same transaction. An external_id that repeats inside a
+    batch is rejected after its first accepted row; across batches the later
+    row updates the earlier one.
+    """
+    report = ImportReport()
+    for batch in chunked(enumerate(rows, start=1), batch_size):
+        parsed = []
+        for number, row in batch:
+            try:
+                values = _parse_order(row)
+            except (KeyError, TypeError, ValueError) as e:
+                report.reject(number, str(e) or type(e).__name__)
+                continue
+            parsed.append((number, values))
+        if parsed:
+            _upsert(parsed, report)
+    return report
+
+
+def _upsert(rows: list, report: ImportReport):
+    user_ids = set(User.objects.filter(pk__in={values["user_id"] for _, values in rows}).values_list("pk", flat=True))
+    by_id = Product.objects.in_bulk({values["product_id"] for _, values in rows if values["product_id"]})
+    by_sku = Product.objects.in_bulk(
+        [values["product_sku"] for _, values in rows if not values["product_id"]], field_name="sku"
+    )
+
+    with transaction.atomic():
+        existing = Order.objects.in_bulk({values["external_id"] for _, values in rows}, field_name="external_id")
+        to_update, to_create = [], []
+        accepted = set()
+        for number, values in rows:
+            product = by_id.get(values["product_id"]) if values["product_id"] else by_sku.get(values["product_sku"])
+            if product is None:
+                report.reject(number, "Product not found.")
+                continue
+            if values["user_id"] not in user_ids:
+                report.reject(number, "User not found.")
+                continue
+            if values["external_id"] in accepted:
+                report.reject(number, "Duplicate key in file.")
+                continue
+            accepted.add(values["external_id"])
+            order = existing.get(values["external_id"])
+            if order is None:
+                order = Order(external_id=values["external_id"])
+                to_create.append(order)
+            elif (order.user_id, order.product_id, order.quantity, order.status) == (
+                    values["user_id"], product.pk, values["quantity"], values["status"]):
+                report.unchanged += 1
+                continue
+            else:
+                to_update.append(order)
+            order.user_id = values["user_id"]
+            order.product = product
+            order.quantity = values["quantity"]
+            order.status = values["status"]
+        Order.objects.bulk_update(to_update, ["user", "product", "quantity", "status"])
+        Order.objects.bulk_create(to_create)
+        # bulk writes skip post_save, so the summaries are written here.
+        save_summaries(to_update + to_create)
+    report.updated += len(to_update)
+    report.created += len(to_create)
+
+
+def _parse_order(row: dict) -> dict:
+    if "_error" in row:
+        raise ValueError(row["_error"])
+    external_id = str(row.get("external_id") or "").strip()
+    if not external_id or len(external_id) > 64:
+        raise ValueError("external_id is required (at most 64 characters).")
+    product_id = int(row["product"]) if str(row.get("product") or "").strip() else None
+    product_sku = str(row.get("product_sku") or "").strip()
+    if product_id is None and not product_sku:
+        raise ValueError("product or product_sku is required.")
+    quantity = int(row["quantity"])
+    if quantity < 1:
+        raise ValueError("quantity must be at least 1.")
+    status = str(row.get("status") or "pending").strip()
+    if status not in STATUSES:
+        raise ValueError(f"Unknown status '{status}'.")
+    return {
+        "external_id": external_id,
+        "user_id": int(row["user"]),
+        "product_id": product_id,
+        "product_sku": product_sku,
+        "quantity": quantity,
+        "status": status,
+    }
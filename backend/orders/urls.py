@@ -3,6 +3,9 @@ from . import views
 
 urlpatterns = [
     path('', views.order_list),
+    path('export/', views.order_export),
+    path('import/', views.order_import),
+    path('bulk/', views.bulk_order_create),
     path('<int:pk>/', views.order_detail),
     # path('user/<int:user_id>/', views.get_my_orders),  
 
@@ -1,13 +1,22 @@
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, parser_classes
 from rest_framework.response import Response
 from rest_framework import status
 from .models import Order
-from .serializers import OrderSerializer
-from drf_spectacular.utils import extend_schema
+from .serializers import OrderSerializer, BulkOrderSerializer, BulkOrderResultSerializer
+from .services import place_orders
+from drf_spectacular.utils import extend_schema, OpenApiParameter
+from AIshop.pagination import paginate
+from rest_framework.parsers import MultiPartParser
+from AIshop.transfer import export_response, import_response
+from .transfer import export_orders, import_orders
 
 @extend_schema(
     summary="List or create orders",
-    description="GET lists all orders. POST places a new order.",
+    description="GET lists orders newest first, one cursor page at a time. POST places a new order.",
+    parameters=[
+        OpenApiParameter("cursor", str, description="Opaque cursor from a previous page's next/previous link."),
+        OpenApiParameter("page_size", int, description="Items per page (default 50, max 500)."),
+    ],
     request=OrderSerializer,
     responses=OrderSerializer,
     tags=["Orders"]
@@ -15,9 +24,7 @@ from drf_spectacular.utils import extend_schema
 @api_view(['GET', 'POST'])
 def order_list(request):
     if request.method == 'GET':
-        orders = Order.objects.all()
-        serializer = OrderSerializer(orders, many=True)
-        return Response(serializer.data)
+        return paginate(request, Order.objects.all(), OrderSerializer)
     elif request.method == 'POST':
         serializer = OrderSerializer(data=request.data)
         if serializer.is_valid():
@@ -53,6 +60,62 @@ def order_detail(request, pk):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+@extend_schema(
+    summary="Place many orders at once",
+    description=(
+        "Places every line for one user in a single transaction. In 'atomic' mode (default) one line "
+        "that cannot be filled rejects the whole batch; in 'partial' mode the lines that can be filled "
+        "are placed and the rest reported. Returns 201 when every line was placed, 207 when only some "
+        "were, and 400 when none were."
+    ),
+    request=BulkOrderSerializer,
+    responses=BulkOrderResultSerializer(many=True),
+    tags=["Orders"]
+)
+@api_view(['POST'])
+def bulk_order_create(request):
+    serializer = BulkOrderSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    data = serializer.validated_data
+    results = place_orders(data['user'].id, data['lines'], data['mode'])
+
+    created = sum(1 for result in results if result['status'] == 'created')
+    if created == len(results):
+        code = status.HTTP_201_CREATED
+    elif created:
+        code = status.HTTP_207_MULTI_STATUS
+    else:
+        code = status.HTTP_400_BAD_REQUEST
+    return Response(BulkOrderResultSerializer(results, many=True).data, status=code)
+
+
+@extend_schema(
+    summary="Export all orders",
+    description="Streams every order as a CSV or JSONL download, oldest first.",
+    parameters=[OpenApiParameter("fmt", str, enum=["csv", "jsonl"], description="Download format (default csv).")],
+    responses={(200, "text/csv"): str, (200, "application/x-ndjson"): str},
+    tags=["Orders"]
+)
+@api_view(['GET'])
+def order_export(request):
+    return export_response(export_orders, request, "orders")
+
+
+@extend_schema(
+    summary="Import orders",
+    description="Upsert orders from a CSV or JSONL file, matched by external_id. Columns: external_id, user, product or product_sku, quantity, status. Product stock is not changed.",
+    parameters=[OpenApiParameter("fmt", str, enum=["csv", "jsonl"], description="File format (default: from the file name).")],
+    request={"multipart/form-data": {"type": "object", "properties": {"file": {"type": "string", "format": "binary"}}}},
+    responses=dict,
+    tags=["Orders"]
+)
+@api_view(['POST'])
+@parser_classes([MultiPartParser])
+def order_import(request):
+    return import_response(import_orders, request)
+
+
 # @extend_schema(
 #     summary="Get all orders for a specific user",
 #     description="Returns a list of orders placed by the user with the given ID.",
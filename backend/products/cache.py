@@ -0,0 +1,116 @@
+import hashlib
+import time
+from typing import Callable, List, Optional
+from django.conf import settings
+from django.core.cache import caches
+from .models import Product
+from .serializers import ProductSerializer
+
+
+class CatalogCache:
+    """
+    Caches the serialized product catalog in a Django cache alias.
+
+    Per-product entries are keyed by id and deleted when that product
+    changes. The full list and list pages live under a catalog version that
+    every product change bumps, so they expire together without a key scan.
+    The alias decides the scope: locmem is per worker, while redis or
+    memcached share one catalog between workers.
+    """
+
+    VERSION_KEY = "catalog:version"
+
+    def __init__(self, alias: str = "default", timeout: Optional[int] = None):
+        self.alias = alias
+        self.timeout = timeout
+
+    @classmethod
+    def from_settings(cls) -> "CatalogCache":
+        return cls(settings.PRODUCT_CACHE_ALIAS, settings.PRODUCT_CACHE_TTL)
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def version(self) -> int:
+        version = self.cache.get(self.VERSION_KEY)
+        if version is None:
+            self.cache.add(self.VERSION_KEY, self._fresh_version(), timeout=None)
+            version = self.cache.get(self.VERSION_KEY)
+        return version
+
+    async def aversion(self) -> int:
+        version = await self.cache.aget(self.VERSION_KEY)
+        if version is None:
+            await self.cache.aadd(self.VERSION_KEY, self._fresh_version(), timeout=None)
+            version = await self.cache.aget(self.VERSION_KEY)
+        return version
+
+    def invalidate(self, product_id=None):
+        """
+        Drop one product's entry (if given) and retire every cached list.
+        """
+        if product_id is not None:
+            self.cache.delete(self._product_key(product_id))
+        try:
+            self.cache.incr(self.VERSION_KEY)
+        except ValueError:
+            self.cache.add(self.VERSION_KEY, self._fresh_version(), timeout=None)
+
+    def invalidate_many(self, product_ids):
+        """
+        invalidate() for a batch: one delete_many and a single version bump.
+        """
+        self.cache.delete_many([self._product_key(product_id) for product_id in product_ids])
+        self.invalidate()
+
+    def get_products(self) -> List[dict]:
+        key = f"catalog:{self.version()}:list"
+        products = self.cache.get(key)
+        if products is None:
+            products = list(ProductSerializer(Product.objects.order_by("id"), many=True).data)
+            self.cache.set(key, products, self.timeout)
+        return products
+
+    async def aget_products(self) -> List[dict]:
+        key = f"catalog:{await self.aversion()}:list"
+        products = await self.cache.aget(key)
+        if products is None:
+            rows = [p async for p in Product.objects.order_by("id")]
+            products = list(ProductSerializer(rows, many=True).data)
+            await self.cache.aset(key, products, self.timeout)
+        return products
+
+    def get_product(self, product_id) -> Optional[dict]:
+        key = self._product_key(product_id)
+        product = self.cache.get(key)
+        if product is None:
+            instance = Product.objects.filter(pk=product_id).first()
+            if instance is None:
+                return None
+            product = dict(ProductSerializer(instance).data)
+            self.cache.set(key, product, self.timeout)
+        return product
+
+    def get_page(self, url: str, build: Callable[[], dict]) -> dict:
+        """
+        Return the cached list page for ``url`` (its cursor and page size),
+        calling ``build`` on a miss.
+        """
+        digest = hashlib.sha256(url.encode()).hexdigest()[:32]
+        key = f"catalog:{self.version()}:page:{digest}"
+        page = self.cache.get(key)
+        if page is None:
+            page = build()
+            self.cache.set(key, page, self.timeout)
+        return page
+
+    def _product_key(self, product_id) -> str:
+        return f"catalog:product:{product_id}"
+
+    def _fresh_version(self) -> int:
+        # If the version key was evicted, start past any version still cached.
+        return time.time_ns()
+
+
+catalog_cache = CatalogCache.from_settings()
@@ -0,0 +1,7 @@
+from AIshop.transfer import ExportCommand
+from products.transfer import export_products
+
+
+class Command(ExportCommand):
+    help = "Stream all products to a CSV or JSONL file (or stdout) without loading them into memory."
+    export_rows = export_products
@@ -0,0 +1,7 @@
+from AIshop.transfer import ImportCommand
+from products.transfer import import_products
+
+
+class Command(ImportCommand):
+    help = "Upsert products from a CSV or JSONL file by their external key, in chunked transactions."
+    import_rows = import_products
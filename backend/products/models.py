@@ -4,6 +4,12 @@ class Product(models.Model):
     name = models.CharField(max_length=100)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     quantity = models.IntegerField(default=1)
+    # Key of the product in an external catalog; imports upsert by it.
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)
+
+    class Meta:
+        # Name search uses a trigram index on PostgreSQL, see migration 0004.
+        indexes = [models.Index(fields=['price'], name='product_price_idx')]
 
     def __str__(self):
         return self.name
@@ -0,0 +1,67 @@
+from decimal import Decimal
+from typing import List, Optional
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, QuerySet, Value, When
+from .models import Product
+
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+SEARCH_FIELDS = ("id", "name", "price", "quantity")
+
+
+def search_queryset(
+        query: str = "",
+        min_price: Optional[Decimal] = None,
+        max_price: Optional[Decimal] = None,
+        in_stock: bool = False,
+        limit: int = DEFAULT_LIMIT,
+) -> QuerySet:
+    """
+    Best matches first, at most ``limit`` (capped at MAX_LIMIT) rows.
+
+    On PostgreSQL the name is matched by substring or trigram word
+    similarity, both served by the GIN trigram index, and ranked by
+    similarity, so typos still match. Elsewhere every word of the query
+    must appear in the name, and names starting with the query rank first.
+    """
+    products = Product.objects.all()
+    if min_price is not None:
+        products = products.filter(price__gte=min_price)
+    if max_price is not None:
+        products = products.filter(price__lte=max_price)
+    if in_stock:
+        products = products.filter(quantity__gt=0)
+
+    query = " ".join(query.split())
+    if not query:
+        ordering = ["price", "id"]
+    elif connection.vendor == "postgresql":
+        from django.contrib.postgres.search import TrigramWordSimilarity
+
+        products = products.filter(Q(name__icontains=query) | Q(name__trigram_word_similar=query))
+        products = products.annotate(rank=TrigramWordSimilarity(query, "name"))
+        ordering = ["-rank", "id"]
+    else:
+        for word in query.split(" "):
+            products = products.filter(name__icontains=word)
+        products = products.annotate(
+            rank=Case(When(name__istartswith=query, then=Value(0)), default=Value(1), output_field=IntegerField())
+        )
+        ordering = ["rank", "id"]
+    return products.order_by(*ordering).values(*SEARCH_FIELDS)[:max(1, min(limit, MAX_LIMIT))]
+
+
+def search_products(**criteria) -> List[dict]:
+    """
+    Run search_queryset(**criteria); prices come back as strings, JSON-ready.
+    """
+    return [_row(row) for row in search_queryset(**criteria)]
+
+
+async def asearch_products(**criteria) -> List[dict]:
+    return [_row(row) async for row in search_queryset(**criteria)]
+
+
+def _row(row: dict) -> dict:
+    return dict(row, price=str(row["price"]))
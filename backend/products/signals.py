@@ -0,0 +1,24 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+from .cache import catalog_cache
+from .models import Product
+
+
+# Sent after a committed bulk write (bulk_create/bulk_update skip post_save),
+# with ``product_ids`` of every product written.
+products_bulk_changed = Signal()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_catalog(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # After commit, so a concurrent reader cannot re-cache the old row.
+    transaction.on_commit(lambda: catalog_cache.invalidate(instance.pk))
+
+
+@receiver(products_bulk_changed)
+def invalidate_catalog_bulk(sender, product_ids, **kwargs):
+    catalog_cache.invalidate_many(product_ids)
@@ -0,0 +1,87 @@
+from decimal import Decimal, InvalidOperation
+from typing import Iterable, Iterator
+from django.db import transaction
+from AIshop.transfer import ImportReport, chunked, write_rows
+from .models import Product
+from .signals import products_bulk_changed
+
+
+EXPORT_FIELDS = ["id", "sku", "name", "price", "quantity"]
+MAX_PRICE = Decimal("99999999.99")
+
+
+def export_products(fmt: str, chunk_size: int = 2000) -> Iterator[str]:
+    """
+    Stream every product as CSV or JSONL text, ``chunk_size`` rows per query.
+    """
+    rows = Product.objects.order_by("id").values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+    return write_rows(rows, EXPORT_FIELDS, fmt)
+
+
+def import_products(rows: Iterable[dict], batch_size: int = 1000) -> ImportReport:
+    """
+    Upsert products by ``sku``, ``batch_size`` rows per transaction.
+
+    Each batch costs one lookup, one ``bulk_update`` and one ``bulk_create``
+    whatever its size, and only one batch is held in memory. Rows that match
+    the stored product exactly are not written. A sku that repeats inside a
+    batch is rejected after its first row; across batches the later row
+    updates the earlier one. Invalid rows are counted and reported, not fatal.
+    """
+    report = ImportReport()
+    for batch in chunked(enumerate(rows, start=1), batch_size):
+        parsed = {}
+        for number, row in batch:
+            try:
+                values = _parse_product(row)
+            except InvalidOperation:
+                report.reject(number, "price is not a number.")
+                continue
+            except (KeyError, TypeError, ValueError) as e:
+                report.reject(number, str(e) or type(e).__name__)
+                continue
+            if values["sku"] in parsed:
+                report.reject(number, "Duplicate key in file.")
+                continue
+            parsed[values["sku"]] = values
+        if parsed:
+            _upsert(parsed, report)
+    return report
+
+
+def _upsert(parsed: dict, report: ImportReport):
+    with transaction.atomic():
+        existing = Product.objects.in_bulk(list(parsed), field_name="sku")
+        to_update, to_create = [], []
+        for sku, values in parsed.items():
+            product = existing.get(sku)
+            if product is None:
+                to_create.append(Product(**values))
+            elif any(getattr(product, field) != value for field, value in values.items()):
+                for field, value in values.items():
+                    setattr(product, field, value)
+                to_update.append(product)
+        Product.objects.bulk_update(to_update, ["name", "price", "quantity"])
+        Product.objects.bulk_create(to_create)
+        product_ids = [product.pk for product in to_update + to_create]
+        if product_ids:
+            transaction.on_commit(lambda: products_bulk_changed.send(sender=Product, product_ids=product_ids))
+    report.updated += len(to_update)
+    report.created += len(to_create)
+    report.unchanged += len(parsed) - len(to_update) - len(to_create)
+
+
+def _parse_product(row: dict) -> dict:
+    if "_error" in row:
+        raise ValueError(row["_error"])
+    sku = str(row.get("sku") or "").strip()
+    if not sku or len(sku) > 64:
+        raise ValueError("sku is required (at most 64 characters).")
+    name = str(row.get("name") or "").strip()
+    if not name or len(name) > 100:
+        raise ValueError("name is required (at most 100 characters).")
+    price = Decimal(str(row["price"]).strip()).quantize(Decimal("0.01"))
+    if not Decimal(0) <= price <= MAX_PRICE:
+        raise ValueError(f"price {price} is out of range.")
+    quantity = int(row.get("quantity") or 0)
+    return {"sku": sku, "name": name, "price": price, "quantity": quantity}
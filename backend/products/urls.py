@@ -3,5 +3,8 @@ from . import views
 
 urlpatterns = [
     path('', views.product_list),
+    path('search/', views.product_search),
+    path('export/', views.product_export),
+    path('import/', views.product_import),
     path('<int:pk>/', views.product_detail),
 ]
@@ -1,13 +1,23 @@
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, parser_classes
 from rest_framework.response import Response
 from rest_framework import status
 from .models import Product
-from .serializers import ProductSerializer
-from drf_spectacular.utils import extend_schema
+from .serializers import ProductSerializer, ProductSearchSerializer, ProductSearchResultSerializer
+from .search import search_products
+from .cache import catalog_cache
+from drf_spectacular.utils import extend_schema, OpenApiParameter
+from AIshop.pagination import paginate
+from rest_framework.parsers import MultiPartParser
+from AIshop.transfer import export_response, import_response
+from .transfer import export_products, import_products
 
 @extend_schema(
     summary="List or create products",
-    description="GET lists all products. POST adds a new product.",
+    description="GET lists products newest first, one cursor page at a time. POST adds a new product.",
+    parameters=[
+        OpenApiParameter("cursor", str, description="Opaque cursor from a previous page's next/previous link."),
+        OpenApiParameter("page_size", int, description="Items per page (default 50, max 500)."),
+    ],
     request=ProductSerializer,
     responses=ProductSerializer,
     tags=["Products"]
@@ -15,9 +25,11 @@ from drf_spectacular.utils import extend_schema
 @api_view(['GET', 'POST'])
 def product_list(request):
     if request.method == 'GET':
-        products = Product.objects.all()
-        serializer = ProductSerializer(products, many=True)
-        return Response(serializer.data)
+        page = catalog_cache.get_page(
+            request.build_absolute_uri(),
+            lambda: paginate(request, Product.objects.all(), ProductSerializer).data,
+        )
+        return Response(page)
     elif request.method == 'POST':
         serializer = ProductSerializer(data=request.data)
         if serializer.is_valid():
@@ -35,14 +47,18 @@ def product_list(request):
 
 @api_view(['GET', 'PUT', 'DELETE'])
 def product_detail(request, pk):
+    if request.method == 'GET':
+        product = catalog_cache.get_product(pk)
+        if product is None:
+            return Response({'error': 'Not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(product)
+
     try:
         product = Product.objects.get(pk=pk)
     except Product.DoesNotExist:
         return Response({'error': 'Not found'}, status=status.HTTP_404_NOT_FOUND)
 
-    if request.method == 'GET':
-        return Response(ProductSerializer(product).data)
-    elif request.method == 'PUT':
+    if request.method == 'PUT':
         serializer = ProductSerializer(product, data=request.data)
         if serializer.is_valid():
             serializer.save()
@@ -51,3 +67,55 @@ def product_detail(request, pk):
     elif request.method == 'DELETE':
         product.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+@extend_schema(
+    summary="Export all products",
+    description="Streams every product as a CSV or JSONL download, oldest first.",
+    parameters=[OpenApiParameter("fmt", str, enum=["csv", "jsonl"], description="Download format (default csv).")],
+    responses={(200, "text/csv"): str, (200, "application/x-ndjson"): str},
+    tags=["Products"]
+)
+@api_view(['GET'])
+def product_export(request):
+    return export_response(export_products, request, "products")
+
+
+@extend_schema(
+    summary="Import products",
+    description="Upsert products from a CSV or JSONL file, matched by sku. Columns: sku, name, price, quantity.",
+    parameters=[OpenApiParameter("fmt", str, enum=["csv", "jsonl"], description="File format (default: from the file name).")],
+    request={"multipart/form-data": {"type": "object", "properties": {"file": {"type": "string", "format": "binary"}}}},
+    responses=dict,
+    tags=["Products"]
+)
+@api_view(['POST'])
+@parser_classes([MultiPartParser])
+def product_import(request):
+    return import_response(import_products, request)
+
+
+@extend_schema(
+    summary="Search products",
+    description=(
+        "Finds products by name (typo-tolerant on PostgreSQL), optionally within a price range and only "
+        "in stock. Returns the best matches first, at most `limit`; without `q`, the cheapest matching products."
+    ),
+    parameters=[ProductSearchSerializer],
+    responses=ProductSearchResultSerializer(many=True),
+    tags=["Products"]
+)
+@api_view(['GET'])
+def product_search(request):
+    params = ProductSearchSerializer(data=request.query_params)
+    if not params.is_valid():
+        return Response(params.errors, status=status.HTTP_400_BAD_REQUEST)
+    criteria = params.validated_data
+    results = search_products(
+        query=criteria['q'],
+        min_price=criteria.get('min_price'),
+        max_price=criteria.get('max_price'),
+        in_stock=criteria['in_stock'],
+        limit=criteria['limit'],
+    )
+    return Response(results)
@@ -4,7 +4,8 @@ from django.conf import settings
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
-from drf_spectacular.utils import extend_schema
+from drf_spectacular.utils import extend_schema, OpenApiParameter
+from AIshop.pagination import paginate
 from rest_framework_simplejwt.tokens import RefreshToken
 from .models import User
 import hashlib
@@ -113,14 +114,16 @@ def login(request):
 # 🔹 Get All Users (optional - for admin/demo)
 @extend_schema(
     summary="Get all users",
+    parameters=[
+        OpenApiParameter("cursor", str, description="Opaque cursor from a previous page's next/previous link."),
+        OpenApiParameter("page_size", int, description="Items per page (default 50, max 500)."),
+    ],
     responses={200: UserResponseSerializer(many=True)},
-    description="Returns a list of all users."
+    description="Returns users newest first, one cursor page at a time."
 )
 @api_view(['GET'])
 def user_list(request):
-    users = User.objects.all()
-    serializer = UserResponseSerializer(users, many=True)
-    return Response(serializer.data)
+    return paginate(request, User.objects.all(), UserResponseSerializer)
 
 
 # 🔹 Get, Update, or Delete a User by ID